@@ -1,19 +1,85 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import logging
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode  # [+] для нормализации URL
 import re  # [+] для работы с /page-N/
+import gzip  # [+] для сжатых sitemap.xml.gz
+import xml.etree.ElementTree as ET  # [+] потоковый разбор sitemap
+import codecs  # [+] инкрементальное декодирование потока
+from html.parser import HTMLParser  # [+] поиск маркеров конца в потоке
+from contextlib import nullcontext  # [+] профилирование по запросу
+
+from url_index import canonicalize_url, make_seen_index  # [+] общий индекс просмотренных URL
+from transport import TransportError, make_transport  # [+] HTTP/1.1 или HTTP/2
+from profiling import as_profiler  # [+] cProfile / сэмплирование прогона
+
+
+# Маркеры потоковой загрузки по типам страниц: 'tag' или '.class'.
+# Чтение прекращается, когда встречены все required и после них — любой из end.
+STREAM_MARKERS = {
+    'product': {
+        'required': (
+            '.cnc-product-detail__title',
+            '.cnc-product-detail__price-actual',
+            '.cnc-product-detail__product-code',
+            # описание и характеристики тоже читает parse_product: пока они не встречены,
+            # маркер конца не срабатывает (у страницы без них читается всё — без повторной загрузки)
+            '.cnc-product-description__left',
+            '.cnc-product-features__feature',
+        ),
+        # только подвал страницы: общий <footer> бывает и внутри блоков товара
+        'end': ('.tygh-footer', '.cnc-footer'),
+    },
+}
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class _MarkerWatcher(HTMLParser):
+    """Инкрементальный HTML-парсер: отмечает момент, когда нужные блоки уже прочитаны."""
+
+    def __init__(self, required, end):
+        super().__init__(convert_charrefs=False)
+        self.pending = set(required)
+        self.end = set(end)
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        classes = (dict(attrs).get('class') or '').split()
+        names = {tag} | {'.' + c for c in classes}
+        self.pending -= names
+        if not self.pending and names & self.end:
+            self.done = True
 
 
 class WebParser:
-    def __init__(self):
+    def __init__(self, transport: str = 'http1', **transport_options):
+        """
+        transport: 'http1' — requests.Session (по умолчанию),
+                   'http2' — httpx с мультиплексированием HTTP/2 и brotli/gzip.
+        transport_options: pool_maxsize, timeout, verify (+ keepalive_expiry для http2).
+        """
         self.setup_logging()
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.transport = make_transport(transport, {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }, **transport_options)
+        self.session = self.transport.session
+        # Индекс уже встреченных URL — общий для всех путей обхода в рамках прогона
+        self.seen = make_seen_index()
+        # Потоковая загрузка: маркеры по типам страниц и счётчики досрочных остановок
+        self.stream_markers = dict(STREAM_MARKERS)
+        self.stream_stats = {'early_stops': 0, 'fallbacks': 0}
+        # Профиль последнего обхода с флагом profile (RunProfiler или None)
+        self.profiler = None
+
+    def reset_seen_index(self, kind: str = 'set', capacity: int = 10_000_000, error_rate: float = 0.001):
+        """
+        Начинает новый прогон с пустым индексом просмотренных URL.
+        kind='set' — точный индекс, kind='bloom' — фильтр Блума с фиксированной памятью
+        (для прогонов на миллионы ссылок).
+        """
+        self.seen = make_seen_index(kind, capacity=capacity, error_rate=error_rate)
+        return self.seen
 
     @staticmethod
     def setup_logging():
@@ -29,14 +95,90 @@ class WebParser:
 
     def get_page(self, url: str) -> Optional[BeautifulSoup]:
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
-            return BeautifulSoup(response.text, 'html.parser')
-        except requests.exceptions.RequestException as e:
+            return BeautifulSoup(self.transport.get_text(url), 'html.parser')
+        except TransportError as e:
+            logging.error(f'Ошибка запроса {url}: {str(e)}')
+            return None
+
+    def get_page_streamed(self, url: str, page_type: str = 'product') -> Optional[BeautifulSoup]:
+        """
+        Потоковая загрузка страницы с досрочной остановкой.
+        Чанки подаются в инкрементальный парсер; как только прочитаны все блоки
+        из stream_markers[page_type]['required'] и встретился маркер конца,
+        чтение прекращается и соединение закрывается (подвал, скрипты и карусели
+        не скачиваются). Если в обрезанной странице не нашлось нужных блоков —
+        страница загружается целиком через get_page().
+        """
+        markers = self.stream_markers.get(page_type)
+        if not markers:
+            return self.get_page(url)
+
+        watcher = _MarkerWatcher(markers['required'], markers['end'])
+        parts = []
+        try:
+            with self.transport.open_stream(url) as (stream, headers):
+                decoder = None
+                while True:
+                    chunk = stream.read(STREAM_CHUNK_SIZE)
+                    if decoder is None:
+                        encoding = self._stream_encoding(headers.get('Content-Type', ''), chunk)
+                        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                    if not chunk:
+                        parts.append(decoder.decode(b'', final=True))
+                        break
+                    text = decoder.decode(chunk)
+                    parts.append(text)
+                    watcher.feed(text)
+                    if watcher.done:
+                        break
+        except TransportError as e:
             logging.error(f'Ошибка запроса {url}: {str(e)}')
             return None
 
+        soup = BeautifulSoup(''.join(parts), 'html.parser')
+        if not watcher.done:
+            return soup  # страница прочитана целиком
+
+        missing = [m for m in markers['required'] if not soup.select_one(m)]
+        if missing:
+            logging.warning(f'Потоковая загрузка {url}: нет {missing}, загружаем целиком')
+            self.stream_stats['fallbacks'] += 1
+            return self.get_page(url)
+
+        self.stream_stats['early_stops'] += 1
+        logging.debug(f'Потоковая загрузка {url}: остановка после {sum(map(len, parts))} символов')
+        return soup
+
+    @staticmethod
+    def _stream_encoding(content_type: str, head: bytes) -> str:
+        """Кодировка потока: charset из заголовка, затем <meta charset>, иначе utf-8."""
+        match = re.search(r'charset=["\']?([\w-]+)', content_type, re.IGNORECASE)
+        if not match:
+            match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', head[:4096], re.IGNORECASE)
+        encoding = match.group(1) if match else 'utf-8'
+        if isinstance(encoding, bytes):
+            encoding = encoding.decode('ascii', 'ignore')
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = 'utf-8'
+        return encoding
+
+    def get_pages(self, urls: List[str], concurrency: int = 8) -> List[Optional[BeautifulSoup]]:
+        """
+        Параллельная загрузка пачки страниц через выбранный транспорт
+        (для http2 — мультиплексирование в одном соединении).
+        Порядок результатов совпадает с urls; при ошибке — None.
+        """
+        soups = []
+        for url, text in zip(urls, self.transport.get_many(urls, concurrency)):
+            if text is None:
+                logging.error(f'Ошибка запроса {url}')
+                soups.append(None)
+            else:
+                soups.append(BeautifulSoup(text, 'html.parser'))
+        return soups
+
     def parse_links(self, soup: BeautifulSoup) -> List[str]:
         """Сбор ссылок с главной страницы с двух разных селекторов"""
         links = []
@@ -194,6 +336,7 @@ class WebParser:
 
             # На последней странице блока "показать ещё" нет
             show_more = soup.select_one("div.cnc-pagination__show-more")
+            soup.decompose()  # дерево больше не нужно — освобождаем до загрузки следующей страницы
             if not show_more:
                 return
 
@@ -203,23 +346,161 @@ class WebParser:
             url = urlunparse(parsed._replace(path=next_path))
 
 
-    def iter_category_product_links(self, base_url: str) -> List[str]:
+    def iter_category_product_links(self, base_url: str, profile=None) -> List[str]:
         """
         Возвращает все ссылки на товары из категории, обходя /page-1/, /page-2/, ...
         На каждой странице использует существующий parse_links(soup).
-        Дубликаты убираются с сохранением порядка.
+        Дубликаты (в т.ч. уже встреченные в других категориях этого прогона,
+        с точностью до канонического вида URL) убираются с сохранением порядка.
+        profile — 'cprofile' / 'sampling' или RunProfiler: обход профилируется,
+        профиль остаётся в self.profiler (сохранение — self.profiler.save(путь)).
         """
         all_links: List[str] = []
-        seen = set()
+        self.profiler = as_profiler(profile)
 
-        for page_index, page_url, soup in self._iter_paginated_pages(base_url):
-            page_links = self.parse_links(soup)
-            logging.info(f"  └— ссылок на странице {page_index}: {len(page_links)}")
-            for href in page_links:
-                if href not in seen:
-                    seen.add(href)
-                    all_links.append(href)
+        with self.profiler or nullcontext():
+            for page_index, page_url, soup in self._iter_paginated_pages(base_url):
+                page_links = self.parse_links(soup)
+                logging.info(f"  └— ссылок на странице {page_index}: {len(page_links)}")
+                for href in page_links:
+                    if self.seen.add(href):
+                        all_links.append(href)
 
-        logging.info(f"Итого ссылок в категории: {len(all_links)}")
+        logging.info(f"Итого ссылок в категории: {len(all_links)} (повторов за прогон: {self.seen.hits})")
         return all_links
 
+    # ------------------------------------------------------------------ #
+    #                   Поиск товаров через sitemap.xml                   #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def default_sitemap_url(url: str) -> str:
+        """Возвращает адрес sitemap.xml в корне сайта для произвольной ссылки."""
+        parsed = urlparse(url)
+        return urlunparse((parsed.scheme or 'http', parsed.netloc, '/sitemap.xml', '', '', ''))
+
+    def iter_sitemap_urls(self, sitemap_url: str) -> Iterator[str]:
+        """
+        Потоково читает sitemap.xml (или sitemap index) и yield'ит значения <loc>.
+        Поддерживает gzip (Content-Encoding и файлы *.xml.gz).
+        Вложенные sitemap из индекса обходятся после закрытия текущего ответа,
+        поэтому в памяти одновременно находится только один элемент <url>.
+        """
+        pending = [sitemap_url]
+        visited = set()
+
+        while pending:
+            current = pending.pop(0)
+            if current in visited:
+                continue
+            visited.add(current)
+
+            logging.info(f'Читаем sitemap: {current}')
+            try:
+                with self.transport.open_stream(current) as (stream, headers):
+                    content_type = headers.get('Content-Type', '')
+                    if current.endswith('.gz') or 'gzip' in content_type:
+                        stream = gzip.GzipFile(fileobj=stream)
+
+                    root = None
+                    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+                        if root is None:
+                            root = elem
+                            continue
+                        if event != 'end':
+                            continue
+
+                        tag = elem.tag.rsplit('}', 1)[-1]
+                        if tag == 'url':
+                            loc = self._sitemap_loc(elem)
+                            if loc:
+                                yield loc
+                            root.clear()  # не копим обработанные <url>
+                        elif tag == 'sitemap':
+                            loc = self._sitemap_loc(elem)
+                            if loc:
+                                pending.append(loc)
+                            root.clear()
+            except TransportError as e:
+                logging.error(f'Ошибка запроса {current}: {str(e)}')
+            except (ET.ParseError, OSError, EOFError) as e:
+                logging.error(f'Ошибка разбора sitemap {current}: {str(e)}')
+
+    @staticmethod
+    def _sitemap_loc(elem: ET.Element) -> Optional[str]:
+        for child in elem:
+            if child.tag.rsplit('}', 1)[-1] == 'loc' and child.text:
+                return child.text.strip()
+        return None
+
+    def iter_sitemap_product_links(
+        self,
+        sitemap_url: str,
+        url_pattern: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Ссылки на товары из sitemap. Фильтры альтернативные: если задан
+        url_pattern (regex), берутся все совпавшие адреса сайта — товары
+        не обязаны лежать под путём категории; иначе — адреса под префиксом
+        категории prefix, кроме страниц пагинации /page-N/.
+        Дубликаты убираются через общий индекс self.seen.
+        """
+        pattern = re.compile(url_pattern) if url_pattern else None
+        # http/https не различаем: sitemap часто отдаёт канонический https
+        prefix = prefix.split('://', 1)[-1] if prefix else None
+        for loc in self.iter_sitemap_urls(sitemap_url):
+            if pattern is not None:
+                if not pattern.search(loc):
+                    continue
+            elif prefix:
+                bare = loc.split('://', 1)[-1]
+                if not bare.startswith(prefix) or bare == prefix:
+                    continue
+                if re.search(r'/page-\d+/?(\?|$)', bare):
+                    continue
+            if self.seen.add(loc):
+                yield loc
+
+    @staticmethod
+    def _drop_listing_urls(links: List[str]) -> List[str]:
+        """
+        Убирает адреса, под которыми в списке есть другие адреса: это
+        подкатегории и листинги, а не карточки товаров.
+        """
+        paths = [canonicalize_url(link).split('?', 1)[0] for link in links]
+        parents = set()
+        for path in paths:
+            while path.count('/') > 3:  # '//host/a' — дальше подниматься некуда
+                path = path.rsplit('/', 1)[0]
+                parents.add(path)
+        return [link for link, path in zip(links, paths) if path not in parents]
+
+    def discover_product_links(
+        self,
+        base_url: str,
+        sitemap_url: Optional[str] = None,
+        url_pattern: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Ссылки на товары категории через sitemap.xml (без загрузки страниц категории).
+        url_pattern — шаблон адресов товаров по всему сайту; без него фильтр —
+        путь категории без /page-N/, а подкатегории и листинги (адреса, под
+        которыми есть другие адреса) отбрасываются. Если в sitemap ничего
+        не нашлось, выполняется обычный обход пагинации iter_category_product_links().
+        """
+        sitemap_url = sitemap_url or self.default_sitemap_url(base_url)
+        parsed = urlparse(base_url)
+        category_path = re.sub(r'/page-\d+/?$', '/', parsed.path or '/')
+        if not category_path.endswith('/'):
+            category_path += '/'
+        prefix = urlunparse(parsed._replace(path=category_path, params='', query='', fragment=''))
+
+        links = list(self.iter_sitemap_product_links(sitemap_url, url_pattern, prefix))
+        if not url_pattern:
+            links = self._drop_listing_urls(links)
+        if links:
+            logging.info(f'Итого ссылок из sitemap: {len(links)}')
+            return links
+
+        logging.warning(f'В sitemap нет товаров для {base_url}, переходим к обходу пагинации')
+        return self.iter_category_product_links(base_url)
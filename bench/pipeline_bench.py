@@ -0,0 +1,130 @@
+"""
+Конвейер обхода каталога: пропускная способность и память.
+
+Поднимает локальный стенд (ThreadingHTTPServer) с N категориями по P страниц,
+страницы — тяжёлые (карточки + «балласт» разметки), ответ задерживается на
+--latency секунд. Запускает ProductListParser.run() в отдельном процессе для
+каждого числа потоков загрузки и выводит время, страниц/с, пиковый RSS
+и пик байт «в полёте» (между загрузкой и разбором).
+
+Запуск (из корня репозитория):
+    python bench/pipeline_bench.py --categories 40 --pages 5 --workers 1 4 8
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import re
+import resource
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+# ========================================================================= #
+#                           ЛОКАЛЬНЫЙ СТЕНД                                 #
+# ========================================================================= #
+def _make_page(category: int, page: int, pages: int, filler_kb: int) -> bytes:
+    cards = "".join(
+        f'<div class="cnc-product-categories-mob-card">'
+        f'<div class="cnc-product-categories-mob-card__header">'
+        f'<a href="/p/{category}-{page}-{i}/">Товар {category}-{page}-{i}</a>'
+        f'<span class="cnc-product-categories-mob-card__brand">Бренд: B{i % 7}</span></div>'
+        f'<span class="cnc-product-categories-mob-card__sku"><span class="cnc-sku__product-code">{i}</span></span>'
+        f'<div class="cnc-product-categories-mob-card__current-price">{i * 10} ₽</div>'
+        f'<span class="cnc-product-amount__status">В наличии</span></div>'
+        for i in range(48)
+    )
+    filler = '<div class="x"><span>—</span></div>' * (filler_kb * 1024 // 36)
+    more = '<div class="cnc-pagination__show-more">ещё</div>' if page < pages else ""
+    return (
+        f'<html><body><h1 class="cnc-title-xl"><span>Категория {category}</span></h1>'
+        f"{cards}{filler}{more}</body></html>"
+    ).encode("utf-8")
+
+
+def _serve(port: int, pages: int, filler_kb: int, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.match(r"/cat(\d+)/page-(\d+)/", self.path)
+            if not match:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            body = _make_page(int(match[1]), int(match[2]), pages, filler_kb)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ========================================================================= #
+#                               ЗАМЕР                                       #
+# ========================================================================= #
+def _run_once(links, workers: int, budget: int, result) -> None:
+    import logging
+
+    from product_list_parser import ProductListParser
+
+    logging.disable(logging.INFO)
+    parser = ProductListParser(links, fetch_workers=workers, max_inflight_bytes=budget)
+    started = time.perf_counter()
+    rows, stats = parser.run()
+    result.update(
+        elapsed=time.perf_counter() - started,
+        rows=len(rows),
+        sheets=list(parser._sheet_data),
+        pages=stats["pages"],
+        peak_inflight=stats["peak_inflight_bytes"],
+        rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--categories", type=int, default=40)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--filler-kb", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--budget-mb", type=float, default=4)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--port", type=int, default=8951)
+    args = ap.parse_args()
+
+    server = _serve(args.port, args.pages, args.filler_kb, args.latency)
+    links = [f"http://127.0.0.1:{args.port}/cat{i}/" for i in range(args.categories)]
+    budget = int(args.budget_mb * 1024 * 1024)
+
+    print(f"{'workers':>7} {'rows':>6} {'time_s':>7} {'pages/s':>8} {'peak_rss_mb':>11} {'peak_inflight_mb':>16}")
+    reference = None
+    with multiprocessing.Manager() as manager:
+        for workers in args.workers:
+            result = manager.dict()
+            proc = multiprocessing.Process(target=_run_once, args=(links, workers, budget, result))
+            proc.start()
+            proc.join()
+            r = dict(result)
+            # порядок листов и строк не зависит от числа потоков
+            reference = reference or (r["rows"], r["sheets"])
+            assert (r["rows"], r["sheets"]) == reference, "результат отличается от последовательного"
+            print(
+                f"{workers:>7} {r['rows']:>6} {r['elapsed']:>7.2f} {r['pages'] / r['elapsed']:>8.1f} "
+                f"{r['rss_mb']:>11.1f} {r['peak_inflight'] / 2**20:>16.2f}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
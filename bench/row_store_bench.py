@@ -0,0 +1,76 @@
+"""
+Память на строку листинга: список словарей против RowStore.
+
+Генерирует N строк, похожих на строки ProductListParser (название, бренд из
+небольшого набора, артикул, цена, наличие), и замеряет через tracemalloc
+прирост памяти при накоплении тех же строк двумя способами:
+прежним list[dict] и колоночным RowStore. Строки создаются заново для
+каждого замера, как при разборе страниц, — общие объекты не учитываются
+в пользу одного из вариантов.
+
+Запуск (из корня репозитория):
+    python bench/row_store_bench.py --rows 200000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from row_store import RowStore  # noqa: E402
+
+_BRANDS = [f"Бренд {i}" for i in range(40)]
+_AVAILABILITY = ["В наличии", "Под заказ", "Нет в наличии", "Н/Д"]
+
+
+def _make_row(i: int) -> dict:
+    # f-строки и срезы дают новые объекты на каждой строке — как get_text() при разборе
+    return {
+        "Название": f"Товар {i} для дома и сада, модель {i % 977}",
+        "Бренд": f"{_BRANDS[i % len(_BRANDS)]}",
+        "Артикул": f"119-{100000 + i}",
+        "Цена": f"{(i * 37) % 100000}.00",
+        "Наличие": f"{_AVAILABILITY[i % len(_AVAILABILITY)]}",
+        "Ссылка": f"https://example.com/product/{i}/",
+    }
+
+
+def _measure(rows: int, use_store: bool) -> int:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    if use_store:
+        data = RowStore()
+        for i in range(rows):
+            data.append(_make_row(i))
+    else:
+        # прежний вариант: строки как есть, без служебной ссылки (её не было в Excel)
+        data = []
+        for i in range(rows):
+            row = _make_row(i)
+            row.pop("Ссылка")
+            data.append(row)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del data
+    return used
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=200_000)
+    args = ap.parse_args()
+
+    print(f"{'storage':10} {'rows':>8} {'total_mb':>9} {'bytes/row':>10}")
+    for name, use_store in (("list[dict]", False), ("RowStore", True)):
+        used = _measure(args.rows, use_store)
+        print(f"{name:10} {args.rows:>8} {used / 2**20:>9.1f} {used / args.rows:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Сравнение транспортов WebParser: HTTP/1.1 (requests) и HTTP/2 (httpx).
+
+Поднимает локальный стенд на hypercorn (TLS + ALPN h2/http1.1, самоподписанный
+сертификат через openssl): --categories категорий по --pages страниц, ответ
+задерживается на --latency секунд, тела сжимаются brotli/gzip, соединения
+считаются вместе с пиком одновременных запросов. Обход идёт тем же путём, что и в приложении, —
+ProductListParser.run() с fetch_workers=N (загрузка через get_text из потоков
+конвейера). Для каждого бэкенда и числа потоков выводит число TCP-соединений,
+пик одновременных запросов на стенде, байты тел ответов «на проводе» (после
+сжатия, без заголовков) и страниц/с. На слабой машине темп ограничивает разбор
+BeautifulSoup; --cards уменьшает страницы, чтобы сетевая задержка преобладала.
+
+Запуск (из корня репозитория):
+    pip install "httpx[http2,brotli]" hypercorn
+    python bench/transport_bench.py --categories 20 --pages 5 --workers 1 8 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import logging
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Parse import WebParser  # noqa: E402
+from product_list_parser import ProductListParser  # noqa: E402
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: тогда стенд сжимает только gzip
+    brotli = None
+
+
+# ========================================================================= #
+#                           ЛОКАЛЬНЫЙ СТЕНД                                 #
+# ========================================================================= #
+def _make_page(category: int, page: int, pages: int, cards_per_page: int) -> bytes:
+    cards = "".join(
+        f'<div class="cnc-product-categories-mob-card">'
+        f'<div class="cnc-product-categories-mob-card__header">'
+        f'<a href="https://127.0.0.1/p/{category}-{page}-{i}/">Товар {category}-{page}-{i}</a></div>'
+        f'<span class="cnc-product-categories-mob-card__sku"><span class="cnc-sku__product-code">{i}</span></span>'
+        f'<div class="cnc-product-categories-mob-card__current-price">{i * 10} ₽</div></div>'
+        for i in range(cards_per_page)
+    )
+    more = '<div class="cnc-pagination__show-more">ещё</div>' if page < pages else ""
+    return (
+        f'<html><body><h1 class="cnc-title-xl"><span>Категория {category}</span></h1>'
+        f"{cards}{more}</body></html>"
+    ).encode("utf-8")
+
+
+class StandInServer:
+    """ASGI-приложение: страницы категорий со сжатием + учёт соединений по (host, port) клиента."""
+
+    def __init__(self, pages: int, latency: float, cards_per_page: int) -> None:
+        self.pages = pages
+        self.latency = latency
+        self.cards_per_page = cards_per_page
+        self.connections: set = set()
+        self.protocols: set = set()
+        self.active = 0
+        self.peak_active = 0
+
+    def reset(self) -> None:
+        self.connections.clear()
+        self.protocols.clear()
+        self.peak_active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.connections.add(tuple(scope.get("client") or ()))
+        self.protocols.add(scope.get("http_version"))
+
+        match = re.match(r"/cat(\d+)/page-(\d+)/", scope["path"])
+        if not match:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        body = _make_page(int(match[1]), int(match[2]), self.pages, self.cards_per_page)
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode()
+        headers = [(b"content-type", b"text/html; charset=utf-8")]
+        if brotli is not None and "br" in accept:
+            body = brotli.compress(body)
+            headers.append((b"content-encoding", b"br"))
+        elif "gzip" in accept:
+            body = gzip.compress(body)
+            headers.append((b"content-encoding", b"gzip"))
+        headers.append((b"content-length", str(len(body)).encode()))
+
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _start_server(app: StandInServer, port: int, workdir: Path) -> None:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    cert, key = workdir / "cert.pem", workdir / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True,
+    )
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.certfile, config.keyfile = str(cert), str(key)
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.loglevel = "WARNING"
+
+    async def _serve() -> None:
+        # в фоновом потоке нельзя ставить обработчики сигналов — свой триггер остановки
+        await serve(app, config, shutdown_trigger=asyncio.Event().wait)
+
+    thread = threading.Thread(target=lambda: asyncio.run(_serve()), daemon=True)
+    thread.start()
+    time.sleep(1.5)
+
+
+# ========================================================================= #
+#                               ЗАМЕР                                       #
+# ========================================================================= #
+def _bench(kind: str, app: StandInServer, port: int, categories: int, workers: int) -> dict:
+    app.reset()
+    links = [f"https://127.0.0.1:{port}/cat{i}/" for i in range(categories)]
+    parser = ProductListParser(
+        links,
+        base_parser=WebParser(transport=kind, pool_maxsize=workers, verify=False),
+        fetch_workers=workers,
+    )
+
+    started = time.perf_counter()
+    rows, stats = parser.run()
+    elapsed = time.perf_counter() - started
+    parser.parser.transport.close()
+
+    return {
+        "backend": kind,
+        "workers": workers,
+        "protocol": ",".join(sorted(p for p in app.protocols if p)),
+        "rows": len(rows),
+        "pages": stats["pages"],
+        "connections": len(app.connections),
+        "peak_active": app.peak_active,
+        "bytes_on_wire": parser.parser.transport.stats["bytes_received"],
+        "pages_per_s": stats["pages"] / elapsed,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--categories", type=int, default=20)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--cards", type=int, default=48)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    ap.add_argument("--port", type=int, default=8943)
+    args = ap.parse_args()
+
+    import urllib3
+    urllib3.disable_warnings()
+    logging.disable(logging.INFO)
+
+    app = StandInServer(args.pages, args.latency, args.cards)
+    with tempfile.TemporaryDirectory() as tmp:
+        _start_server(app, args.port, Path(tmp))
+        results = [
+            _bench(kind, app, args.port, args.categories, workers)
+            for kind in ("http1", "http2")
+            for workers in args.workers
+        ]
+
+    print(
+        f"{'backend':8} {'workers':>7} {'proto':6} {'rows':>6} {'conns':>6} "
+        f"{'in_flight':>9} {'wire_body':>10} {'pages/s':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['backend']:8} {r['workers']:>7} {r['protocol']:6} {r['rows']:>6} {r['connections']:>6} "
+            f"{r['peak_active']:>9} {r['bytes_on_wire']:>10} {r['pages_per_s']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
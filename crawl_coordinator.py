@@ -0,0 +1,755 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import multiprocessing
+import socket
+import sqlite3
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from Parse import WebParser
+from product_list_parser import ProductListParser, make_unique_sheet_name
+from row_store import LISTING_COLUMNS
+from url_index import canonicalize_url, make_seen_index
+from wide_table import WideTableBuilder
+
+__all__ = [
+    "WorkItem",
+    "SQLiteWorkQueue",
+    "RedisWorkQueue",
+    "SQLiteRowSink",
+    "RedisRowSink",
+    "CrawlCoordinator",
+    "open_queue",
+    "open_sink",
+    "run_worker",
+]
+
+CATEGORY = "category"  # обход всех страниц категории
+PRODUCT = "product"    # детальная страница товара
+
+logger = logging.getLogger("CrawlCoordinator")
+
+
+# ========================================================================= #
+#                              ЗАДАНИЕ                                      #
+# ========================================================================= #
+class WorkItem:
+    """Задание из очереди: тип, полезная нагрузка и номер попытки."""
+
+    __slots__ = ("id", "kind", "payload", "attempts")
+
+    def __init__(self, item_id: int, kind: str, payload: Dict[str, Any], attempts: int) -> None:
+        self.id = item_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"WorkItem({self.id}, {self.kind}, {self.payload.get('url')!r}, attempt={self.attempts})"
+
+
+def _item_key(kind: str, payload: Mapping[str, Any]) -> str:
+    """Ключ уникальности задания: повторная постановка того же URL в ту же группу игнорируется."""
+    return f"{kind}|{payload.get('group', '')}|{canonicalize_url(payload['url'])}"
+
+
+# ========================================================================= #
+#                         ОЧЕРЕДЬ: SQLite (локально)                        #
+# ========================================================================= #
+class SQLiteWorkQueue:
+    """
+    Очередь заданий в файле SQLite: несколько процессов одной машины
+    (или машин с общим диском) арендуют задания через BEGIN IMMEDIATE.
+    Аренда истекает через lease_seconds — задание снова становится доступным;
+    после max_attempts попыток задание помечается failed.
+    """
+
+    def __init__(self, path: str | Path, max_attempts: int = 3) -> None:
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()  # один экземпляр может использоваться из потоков
+        self._conn = sqlite3.connect(
+            self.path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_key    TEXT UNIQUE,
+                kind        TEXT NOT NULL,
+                payload     TEXT NOT NULL,
+                status      TEXT NOT NULL DEFAULT 'pending',
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                worker      TEXT,
+                lease_until REAL,
+                error       TEXT
+            );
+            CREATE INDEX IF NOT EXISTS items_status ON items(status, id);
+            """
+        )
+
+    def put_many(self, kind: str, payloads: Iterable[Mapping[str, Any]]) -> int:
+        """Ставит задания в очередь; возвращает число действительно добавленных."""
+        rows = [(_item_key(kind, p), kind, json.dumps(p, ensure_ascii=False)) for p in payloads]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items(item_key, kind, payload) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[WorkItem]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # просроченные аренды без оставшихся попыток — в failed
+                self._conn.execute(
+                    "UPDATE items SET status='failed', error='аренда истекла' "
+                    "WHERE status='leased' AND lease_until < ? AND attempts >= ?",
+                    (now, self.max_attempts),
+                )
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, attempts FROM items "
+                    "WHERE status='pending' OR (status='leased' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE items SET status='leased', worker=?, lease_until=?, "
+                        "attempts=attempts+1 WHERE id=?",
+                        (worker_id, now + lease_seconds, row[0]),
+                    )
+            finally:
+                self._conn.execute("COMMIT")
+        if not row:
+            return None
+        return WorkItem(row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+    def extend(self, item: WorkItem, worker_id: str, lease_seconds: float) -> bool:
+        """Продлевает аренду; False — аренда уже потеряна (истекла и передана другому)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE items SET lease_until=? WHERE id=? AND status='leased' AND worker=?",
+                (time.time() + lease_seconds, item.id, worker_id),
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, item: WorkItem, worker_id: str) -> bool:
+        """False — задание уже арендовал другой воркер, итог остаётся за ним."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE items SET status='done', error=NULL WHERE id=? AND worker=?",
+                (item.id, worker_id),
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, item: WorkItem, worker_id: str, error: str) -> bool:
+        """False — задание уже арендовал другой воркер, его аренда не трогается."""
+        status = "failed" if item.attempts >= self.max_attempts else "pending"
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE items SET status=?, error=?, lease_until=NULL WHERE id=? AND worker=?",
+                (status, error, item.id, worker_id),
+            )
+        return cursor.rowcount > 0
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def unfinished(self) -> int:
+        counts = self.counts()
+        return counts["pending"] + counts["leased"]
+
+    def failed_items(self) -> List[Tuple[str, str, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, payload, error FROM items WHERE status='failed' ORDER BY id"
+            ).fetchall()
+        return [(kind, json.loads(payload)["url"], error or "") for kind, payload, error in rows]
+
+
+# ========================================================================= #
+#                   ОЧЕРЕДЬ: Redis (несколько машин)                        #
+# ========================================================================= #
+class RedisWorkQueue:
+    """
+    Очередь заданий в Redis для воркеров на разных машинах.
+    Принимает любой клиент с API redis-py (в т.ч. локальную замену fakeredis).
+    Ключи: <prefix>:item:<id> (hash), <prefix>:pending (list),
+    <prefix>:leased (zset, score = срок аренды), <prefix>:keys (set уникальности).
+    """
+
+    def __init__(self, client: Any, prefix: str = "crawl", max_attempts: int = 3) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def put_many(self, kind: str, payloads: Iterable[Mapping[str, Any]]) -> int:
+        added = 0
+        for payload in payloads:
+            if not self.client.sadd(self._key("keys"), _item_key(kind, payload)):
+                continue
+            item_id = self.client.incr(self._key("seq"))
+            self.client.hset(
+                self._key(f"item:{item_id}"),
+                mapping={
+                    "kind": kind,
+                    "payload": json.dumps(payload, ensure_ascii=False),
+                    "attempts": 0,
+                    "status": "pending",
+                },
+            )
+            self.client.rpush(self._key("pending"), item_id)
+            added += 1
+        return added
+
+    def _requeue_expired(self, now: float) -> None:
+        for raw_id in self.client.zrangebyscore(self._key("leased"), 0, now):
+            if not self.client.zrem(self._key("leased"), raw_id):
+                continue  # уже забрал другой воркер
+            item_key = self._key(f"item:{int(raw_id)}")
+            attempts = int(self.client.hget(item_key, "attempts") or 0)
+            if attempts >= self.max_attempts:
+                self.client.hset(item_key, mapping={"status": "failed", "error": "аренда истекла"})
+                self.client.sadd(self._key("failed"), int(raw_id))
+            else:
+                self.client.hset(item_key, "status", "pending")
+                self.client.rpush(self._key("pending"), int(raw_id))
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[WorkItem]:
+        now = time.time()
+        self._requeue_expired(now)
+        raw_id = self.client.lpop(self._key("pending"))
+        if raw_id is None:
+            return None
+        item_id = int(raw_id)
+        item_key = self._key(f"item:{item_id}")
+        # окно между lpop и zadd мало; при падении воркера в нём задание теряется
+        self.client.zadd(self._key("leased"), {item_id: now + lease_seconds})
+        attempts = self.client.hincrby(item_key, "attempts", 1)
+        self.client.hset(item_key, mapping={"status": "leased", "worker": worker_id})
+        data = self.client.hgetall(item_key)
+        kind = _text(data.get(b"kind", data.get("kind")))
+        payload = json.loads(_text(data.get(b"payload", data.get("payload"))))
+        return WorkItem(item_id, kind, payload, int(attempts))
+
+    def _owned_by(self, item: WorkItem, worker_id: str) -> bool:
+        """Задание числится за worker_id (после истечения аренды его мог взять другой)."""
+        return _text(self.client.hget(self._key(f"item:{item.id}"), "worker") or b"") == worker_id
+
+    def extend(self, item: WorkItem, worker_id: str, lease_seconds: float) -> bool:
+        """Продлевает аренду; False — аренда уже потеряна (истекла и передана другому)."""
+        if not self._owned_by(item, worker_id):
+            return False
+        # xx: только если задание всё ещё числится арендованным
+        self.client.zadd(self._key("leased"), {item.id: time.time() + lease_seconds}, xx=True)
+        return self.client.zscore(self._key("leased"), item.id) is not None
+
+    def complete(self, item: WorkItem, worker_id: str) -> bool:
+        if not self._owned_by(item, worker_id):
+            return False
+        self.client.zrem(self._key("leased"), item.id)
+        # если аренда успела истечь, задание могло вернуться в pending/failed — убираем оттуда
+        self.client.lrem(self._key("pending"), 0, item.id)
+        self.client.srem(self._key("failed"), item.id)
+        self.client.hset(self._key(f"item:{item.id}"), mapping={"status": "done", "error": ""})
+        self.client.sadd(self._key("done"), item.id)
+        return True
+
+    def fail(self, item: WorkItem, worker_id: str, error: str) -> bool:
+        if not self._owned_by(item, worker_id):
+            return False
+        self.client.zrem(self._key("leased"), item.id)
+        item_key = self._key(f"item:{item.id}")
+        if item.attempts >= self.max_attempts:
+            self.client.hset(item_key, mapping={"status": "failed", "error": error})
+            self.client.sadd(self._key("failed"), item.id)
+        else:
+            self.client.hset(item_key, mapping={"status": "pending", "error": error})
+            self.client.rpush(self._key("pending"), item.id)
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "pending": int(self.client.llen(self._key("pending"))),
+            "leased": int(self.client.zcard(self._key("leased"))),
+            "done": int(self.client.scard(self._key("done"))),
+            "failed": int(self.client.scard(self._key("failed"))),
+        }
+
+    def unfinished(self) -> int:
+        counts = self.counts()
+        return counts["pending"] + counts["leased"]
+
+    def failed_items(self) -> List[Tuple[str, str, str]]:
+        result = []
+        for raw_id in sorted(int(i) for i in self.client.smembers(self._key("failed"))):
+            data = {_text(k): _text(v) for k, v in self.client.hgetall(self._key(f"item:{raw_id}")).items()}
+            result.append((data["kind"], json.loads(data["payload"])["url"], data.get("error", "")))
+        return result
+
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+# ========================================================================= #
+#                          ОБЩИЙ ПРИЁМНИК СТРОК                             #
+# ========================================================================= #
+class SQLiteRowSink:
+    """
+    Приёмник строк в SQLite. Запись идемпотентна по заданию: повторная
+    обработка (после истёкшей аренды) заменяет строки, а не дублирует их.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sink_groups (
+                group_key TEXT PRIMARY KEY,
+                ord       INTEGER NOT NULL,
+                title     TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sink_rows (
+                item_id   INTEGER NOT NULL,
+                seq       INTEGER NOT NULL,
+                group_key TEXT NOT NULL,
+                data      TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sink_rows_group ON sink_rows(group_key, item_id, seq);
+            CREATE INDEX IF NOT EXISTS sink_rows_item ON sink_rows(item_id);
+            """
+        )
+
+    def set_group(self, group_key: str, order: int, title: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sink_groups(group_key, ord) VALUES (?, ?)", (group_key, order)
+            )
+            if title:
+                self._conn.execute(
+                    "UPDATE sink_groups SET title=? WHERE group_key=?", (title, group_key)
+                )
+
+    def write(self, item_id: int, group_key: str, rows: List[Mapping[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM sink_rows WHERE item_id=?", (item_id,))
+            self._conn.executemany(
+                "INSERT INTO sink_rows(item_id, seq, group_key, data) VALUES (?, ?, ?, ?)",
+                [
+                    (item_id, seq, group_key, json.dumps(row, ensure_ascii=False))
+                    for seq, row in enumerate(rows)
+                ],
+            )
+            self._conn.execute("COMMIT")
+
+    def groups(self) -> List[Tuple[str, Optional[str]]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT group_key, title FROM sink_groups ORDER BY ord"
+            ).fetchall()
+
+    def iter_rows(self, group_key: str) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM sink_rows WHERE group_key=? ORDER BY item_id, seq", (group_key,)
+            ).fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+
+class RedisRowSink:
+    """Приёмник строк в Redis: <prefix>:rows:<group> — hash «id задания → JSON строк»."""
+
+    def __init__(self, client: Any, prefix: str = "crawl") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def set_group(self, group_key: str, order: int, title: Optional[str] = None) -> None:
+        self.client.zadd(f"{self.prefix}:groups", {group_key: order}, nx=True)
+        if title:
+            self.client.hset(f"{self.prefix}:titles", group_key, title)
+
+    def write(self, item_id: int, group_key: str, rows: List[Mapping[str, Any]]) -> None:
+        self.client.hset(
+            f"{self.prefix}:rows:{group_key}", item_id, json.dumps(list(rows), ensure_ascii=False)
+        )
+
+    def groups(self) -> List[Tuple[str, Optional[str]]]:
+        result = []
+        for raw in self.client.zrange(f"{self.prefix}:groups", 0, -1):
+            title = self.client.hget(f"{self.prefix}:titles", raw)
+            result.append((_text(raw), _text(title) if title is not None else None))
+        return result
+
+    def iter_rows(self, group_key: str) -> Iterator[Dict[str, Any]]:
+        stored = self.client.hgetall(f"{self.prefix}:rows:{group_key}")
+        for _, data in sorted(stored.items(), key=lambda kv: int(kv[0])):
+            yield from json.loads(_text(data))
+
+
+# ========================================================================= #
+#                     Открытие бэкенда по адресу                            #
+# ========================================================================= #
+def open_queue(url: str, max_attempts: int = 3):
+    """'sqlite:///path/crawl.db' или 'redis://host:6379/0'."""
+    if url.startswith("sqlite:///"):
+        return SQLiteWorkQueue(url[len("sqlite:///"):], max_attempts=max_attempts)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisWorkQueue(_redis_client(url), max_attempts=max_attempts)
+    raise ValueError(f"Неизвестный бэкенд очереди: {url}")
+
+
+def open_sink(url: str):
+    if url.startswith("sqlite:///"):
+        return SQLiteRowSink(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisRowSink(_redis_client(url))
+    raise ValueError(f"Неизвестный бэкенд приёмника: {url}")
+
+
+def _redis_client(url: str):
+    try:
+        import redis
+    except ImportError as e:  # pragma: no cover - зависит от окружения
+        raise ImportError("Для очереди в Redis установите пакет redis: pip install redis") from e
+    return redis.Redis.from_url(url)
+
+
+# ========================================================================= #
+#                                ВОРКЕР                                     #
+# ========================================================================= #
+def run_worker(
+    queue: Any,
+    sink: Any,
+    worker_id: Optional[str] = None,
+    lease_seconds: float = 300.0,
+    idle_poll: float = 1.0,
+    transport: str = "http1",
+) -> int:
+    """
+    Цикл воркера: арендует задание, обходит страницы через WebParser,
+    пишет строки в приёмник. Завершается, когда в очереди не осталось
+    ни ожидающих, ни арендованных заданий. Возвращает число выполненных.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{multiprocessing.current_process().pid}"
+    parser = WebParser(transport=transport)
+    listing = ProductListParser([], base_parser=parser)
+    processed = 0
+
+    while True:
+        item = queue.lease(worker_id, lease_seconds)
+        if item is None:
+            if queue.unfinished() == 0:
+                break
+            time.sleep(idle_poll)  # задания ещё у других воркеров (и могут породить новые)
+            continue
+        try:
+            with _LeaseHeartbeat(queue, item, worker_id, lease_seconds):
+                _process_item(item, queue, sink, parser, listing)
+        except Exception as exc:
+            logger.warning("[%s] %r: %s", worker_id, item, exc)
+            if not queue.fail(item, worker_id, str(exc)):
+                logger.warning("[%s] %r уже у другого воркера — ошибка не учтена", worker_id, item)
+        else:
+            if queue.complete(item, worker_id):
+                processed += 1
+            else:
+                logger.warning("[%s] %r уже у другого воркера — итог остаётся за ним", worker_id, item)
+
+    logger.info("[%s] готово, выполнено заданий: %d", worker_id, processed)
+    return processed
+
+
+class _LeaseHeartbeat:
+    """
+    Продлевает аренду задания в фоне, пока воркер его обрабатывает:
+    обход большой категории бывает дольше lease_seconds, и без продления
+    задание ушло бы второму воркеру (или в failed после max_attempts).
+    """
+
+    def __init__(self, queue: Any, item: WorkItem, worker_id: str, lease_seconds: float) -> None:
+        self.queue = queue
+        self.item = item
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def __enter__(self) -> "_LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.extend(self.item, self.worker_id, self.lease_seconds):
+                    logger.warning("[%s] аренда %r потеряна", self.worker_id, self.item)
+                    return
+            except Exception as exc:  # сбой связи с очередью — попробуем на следующем такте
+                logger.warning("[%s] не удалось продлить аренду %r: %s", self.worker_id, self.item, exc)
+
+
+def _process_item(
+    item: WorkItem, queue: Any, sink: Any, parser: WebParser, listing: ProductListParser
+) -> None:
+    url = item.payload["url"]
+    group = item.payload.get("group", url)
+
+    if item.kind == CATEGORY:
+        title, rows = listing.crawl_category(url)
+        if title is None:
+            raise RuntimeError("не загрузилась ни одна страница категории")
+        sink.set_group(group, item.payload.get("order", 0), title)
+        if item.payload.get("expand"):
+            queue.put_many(
+                PRODUCT,
+                ({"url": row["Ссылка"], "group": group} for row in rows if row.get("Ссылка")),
+            )
+        else:
+            sink.write(item.id, group, [{k: row.get(k, "Н/Д") for k in LISTING_COLUMNS} for row in rows])
+    elif item.kind == PRODUCT:
+        soup = parser.get_page_streamed(url, "product")
+        if soup is None:
+            raise RuntimeError("страница товара не загрузилась")
+        row = parser.parse_product(soup)
+        soup.decompose()
+        sink.write(item.id, group, [row])
+    else:
+        raise ValueError(f"Неизвестный тип задания: {item.kind}")
+
+
+def _worker_process(queue_url: str, sink_url: str, worker_id: str, lease_seconds: float, transport: str) -> None:
+    run_worker(open_queue(queue_url), open_sink(sink_url), worker_id, lease_seconds, transport=transport)
+
+
+# ========================================================================= #
+#                              КООРДИНАТОР                                  #
+# ========================================================================= #
+class CrawlCoordinator:
+    """
+    Делит обход каталога на задания в очереди, запускает воркеры и собирает
+    итог в привычный Excel: один лист на категорию.
+
+    queue / sink — адрес ('sqlite:///crawl.db', 'redis://...') или готовый объект
+    (например, RedisWorkQueue поверх fakeredis). Воркеры в отдельных процессах
+    возможны только при адресах; с объектами используются потоки.
+    """
+
+    def __init__(self, queue: Any, sink: Any = None, max_attempts: int = 3) -> None:
+        self.queue_url = queue if isinstance(queue, str) else None
+        self.sink_url = sink if isinstance(sink, str) else (self.queue_url if sink is None else None)
+        self.queue = open_queue(queue, max_attempts) if isinstance(queue, str) else queue
+        if sink is None:
+            if self.sink_url is None:
+                raise ValueError("Для объекта очереди нужно передать и объект приёмника")
+            self.sink = open_sink(self.sink_url)
+        else:
+            self.sink = open_sink(sink) if isinstance(sink, str) else sink
+        self.logger = logger
+
+    # ------------------------------------------------------------------ #
+    #                          Постановка заданий                         #
+    # ------------------------------------------------------------------ #
+    def submit_categories(self, links: Iterable[str], expand_products: bool = False) -> int:
+        """
+        Ставит категории в очередь (по заданию на ссылку).
+        expand_products=True — воркер категории ставит задания на детальные
+        страницы товаров, и лист категории заполняется данными parse_product().
+        """
+        # повторы категории (другая схема, /page-N/, порядок query) отсекаются
+        # по каноническому виду первой страницы — как в ProductListParser
+        seen = make_seen_index()
+        payloads = [
+            {"url": url, "group": url, "order": order, "expand": expand_products}
+            for order, url in enumerate(
+                url
+                for url in self._iter_valid_links(links)
+                if seen.add(ProductListParser._normalize_to_first_page(url))
+            )
+        ]
+        added = self.queue.put_many(CATEGORY, payloads)
+        self.logger.info("В очередь поставлено категорий: %d", added)
+        return added
+
+    def submit_products(self, urls: Iterable[str], group: str = "Товары", order: int = 0) -> int:
+        """Ставит в очередь детальные страницы товаров одной группой (одним листом)."""
+        self.sink.set_group(group, order, group)
+        return self.queue.put_many(
+            PRODUCT, ({"url": url, "group": group} for url in self._iter_valid_links(urls))
+        )
+
+    def _iter_valid_links(self, links: Iterable[str]) -> Iterator[str]:
+        """Нормализованные ссылки; некорректные отсеиваются сразу, а не после всех попыток."""
+        for url in ProductListParser.iter_normalized_links(links):
+            if ProductListParser._URL_RE.match(url):
+                yield url
+            else:
+                self.logger.warning("Пропущен некорректный URL: %s", url)
+
+    # ------------------------------------------------------------------ #
+    #                            Запуск воркеров                          #
+    # ------------------------------------------------------------------ #
+    def run_local(
+        self,
+        workers: int = 4,
+        lease_seconds: float = 300.0,
+        transport: str = "http1",
+        processes: Optional[bool] = None,
+    ) -> Dict[str, int]:
+        """Запускает N воркеров на этой машине и ждёт опустошения очереди."""
+        if processes is None:
+            processes = self.queue_url is not None and self.sink_url is not None
+        host = socket.gethostname()
+
+        if processes:
+            if self.queue_url is None or self.sink_url is None:
+                raise ValueError("Процессы-воркеры требуют адресов очереди и приёмника")
+            runners = [
+                multiprocessing.Process(
+                    target=_worker_process,
+                    args=(self.queue_url, self.sink_url, f"{host}-p{i}", lease_seconds, transport),
+                )
+                for i in range(workers)
+            ]
+        else:
+            runners = [
+                threading.Thread(
+                    target=run_worker,
+                    args=(self.queue, self.sink, f"{host}-t{i}", lease_seconds),
+                    kwargs={"transport": transport},
+                )
+                for i in range(workers)
+            ]
+
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+
+        counts = self.queue.counts()
+        self.logger.info(
+            "Очередь | выполнено: %(done)d | ошибок: %(failed)d | осталось: %(pending)d", counts
+        )
+        return counts
+
+    # ------------------------------------------------------------------ #
+    #                        Сборка итогового Excel                       #
+    # ------------------------------------------------------------------ #
+    def merge(self, output_file: str = "product_list.xlsx") -> bytes:
+        """
+        Собирает строки из приёмника в Excel: лист на категорию в порядке
+        постановки, имя листа — заголовок категории (как в ProductListParser).
+        """
+        groups = self.sink.groups()
+        if not groups:
+            raise RuntimeError("Нет данных для сохранения. Сначала запустите воркеры.")
+
+        used_names: Dict[str, int] = {}
+        buffer = BytesIO()
+        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+            for group_key, title in groups:
+                table = WideTableBuilder()
+                for row in self.sink.iter_rows(group_key):
+                    table.add_row(row)
+                df = table.to_dataframe()
+                # листы Excel не должны быть пустыми — проверяем
+                if df.empty:
+                    df = pd.DataFrame({"Нет данных": []})
+                sheet_name = make_unique_sheet_name(title or group_key, used_names)
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+        Path(output_file).write_bytes(buffer.getvalue())
+        self.logger.info("Файл %s создан (%d листов)", Path(output_file).name, len(groups))
+        return buffer.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self.queue.counts()
+        counts["failed_items"] = self.queue.failed_items()
+        return counts
+
+
+# ========================================================================= #
+#                                  CLI                                      #
+# ========================================================================= #
+def _read_links(path: str) -> Iterator[str]:
+    with open(path, "rb") as stream:
+        yield from ProductListParser.iter_links_from_file(stream, path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Распределённый обход каталога")
+    ap.add_argument("--queue", default="sqlite:///crawl.db", help="sqlite:///файл.db или redis://host:port/db")
+    ap.add_argument("--sink", default=None, help="по умолчанию совпадает с --queue")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p_submit = sub.add_parser("submit", help="поставить категории в очередь")
+    p_submit.add_argument("links_file")
+    p_submit.add_argument("--expand", action="store_true", help="собирать детальные страницы товаров")
+
+    p_worker = sub.add_parser("worker", help="запустить воркер (на любой машине)")
+    p_worker.add_argument("--id", default=None)
+    p_worker.add_argument("--lease", type=float, default=300.0)
+    p_worker.add_argument("--transport", default="http1")
+
+    p_run = sub.add_parser("run", help="submit + N локальных воркеров + merge")
+    p_run.add_argument("links_file")
+    p_run.add_argument("--workers", type=int, default=4)
+    p_run.add_argument("--expand", action="store_true")
+    p_run.add_argument("--lease", type=float, default=300.0)
+    p_run.add_argument("--transport", default="http1")
+    p_run.add_argument("--output", default="product_list.xlsx")
+
+    p_merge = sub.add_parser("merge", help="собрать Excel из приёмника")
+    p_merge.add_argument("--output", default="product_list.xlsx")
+
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+    sink_url = args.sink or args.queue
+
+    if args.command == "worker":
+        run_worker(open_queue(args.queue), open_sink(sink_url), args.id, args.lease, transport=args.transport)
+        return
+
+    coordinator = CrawlCoordinator(args.queue, sink_url)
+    if args.command in ("submit", "run"):
+        coordinator.submit_categories(_read_links(args.links_file), expand_products=args.expand)
+    if args.command == "run":
+        coordinator.run_local(args.workers, args.lease, transport=args.transport)
+    if args.command in ("run", "merge"):
+        coordinator.merge(args.output)
+
+
+if __name__ == "__main__":
+    main()
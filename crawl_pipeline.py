@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sys
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+__all__ = ["ByteBudget", "PagePipeline", "PageResult", "SourceDone"]
+
+DEFAULT_INFLIGHT_BYTES = 64 * 1024 * 1024  # байт исходного HTML между загрузкой и разбором
+
+logger = logging.getLogger("PagePipeline")
+
+
+class PageResult(NamedTuple):
+    """Данные одной страницы после стадии извлечения."""
+    source_index: int
+    source: str
+    page_index: int
+    url: str
+    data: Any
+
+
+class SourceDone(NamedTuple):
+    """Источник (категория) обойдён; pages == 0 — не загрузилась ни одна страница."""
+    source_index: int
+    source: str
+    pages: int
+
+
+class _PageTask(NamedTuple):
+    source_index: int
+    source: str
+    page_index: int
+    url: str
+
+
+_STOP = object()  # сигнал остановки рабочих потоков
+
+
+# ========================================================================= #
+#                         БЮДЖЕТ БАЙТ «В ПОЛЁТЕ»                            #
+# ========================================================================= #
+class ByteBudget:
+    """
+    Семафор по байтам: загруженные, но ещё не разобранные страницы не могут
+    суммарно превысить limit. Страница больше лимита пропускается, только
+    когда бюджет пуст (иначе конвейер встал бы навсегда).
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self.total = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        with self._cond:
+            while self.in_flight and self.in_flight + size > self.limit:
+                self._cond.wait()
+            self.in_flight += size
+            self.total += size
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self.in_flight -= size
+            self._cond.notify_all()
+
+
+# ========================================================================= #
+#               КОНВЕЙЕР: загрузка → разбор → извлечение → приёмник        #
+# ========================================================================= #
+class PagePipeline:
+    """
+    Ограниченный по памяти конвейер обхода постраничных источников (категорий).
+
+    Стадии связаны ограниченными очередями, поэтому самая медленная стадия
+    задаёт темп всему конвейеру:
+      fetch    — fetch_workers потоков загружают HTML (str), занимая ByteBudget;
+      parse    — parse_workers потоков строят BeautifulSoup, вызывают extract(),
+                 сразу освобождают дерево (soup.decompose()) и бюджет;
+      sink     — вызывающий код, итерирующий run() (запись в RowStore и т. п.).
+
+    Страницы одного источника идут строго по очереди (адрес следующей
+    известен только после разбора текущей), параллельно обходятся разные
+    источники — не более max_active_sources одновременно. run() отдаёт
+    события в порядке источников, как при последовательном обходе.
+
+    extract(soup, page_index) → (data, has_next): data уходит в приёмник,
+    has_next — есть ли следующая страница (адрес даёт next_url(url, page)).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[str]],
+        extract: Callable[[BeautifulSoup, int], Tuple[Any, bool]],
+        next_url: Callable[[str, int], str],
+        first_url: Callable[[str], str] = lambda url: url,
+        fetch_workers: int = 4,
+        parse_workers: int = 2,
+        max_inflight_bytes: int = DEFAULT_INFLIGHT_BYTES,
+        queue_size: int = 8,
+        max_active_sources: Optional[int] = None,
+        profiler: Any = None,
+    ) -> None:
+        self.fetch = fetch
+        self.extract = extract
+        self.next_url = next_url
+        self.first_url = first_url
+        self.fetch_workers = max(1, fetch_workers)
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = max(1, queue_size)
+        self.max_active_sources = max_active_sources or self.fetch_workers * 2
+        self.budget = ByteBudget(max_inflight_bytes)
+        self.profiler = profiler
+        self.stats: Dict[str, int] = {"pages": 0, "failed_pages": 0}
+        self._stats_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    #                             Стадии                                  #
+    # ------------------------------------------------------------------ #
+    def _attach(self):
+        return self.profiler.attach_thread() if self.profiler is not None else nullcontext()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _fetch_loop(self, tasks: "queue.Queue", pages: "queue.Queue", results: "queue.Queue") -> None:
+        with self._attach():
+            while True:
+                task = tasks.get()
+                if task is _STOP:
+                    return
+                try:
+                    text = self.fetch(task.url)
+                except Exception as exc:
+                    logger.warning("Ошибка загрузки %s: %s", task.url, exc)
+                    text = None
+                if text is None:
+                    self._count("failed_pages")
+                    # обход источника прекращается на первой незагруженной странице
+                    results.put(SourceDone(task.source_index, task.source, task.page_index - 1))
+                    continue
+                size = sys.getsizeof(text)
+                self.budget.acquire(size)   # ждём, пока разбор не догонит загрузку
+                pages.put((task, text, size))  # и пока есть место в очереди
+
+    def _parse_loop(self, tasks: "queue.Queue", pages: "queue.Queue", results: "queue.Queue") -> None:
+        with self._attach():
+            while True:
+                item = pages.get()
+                if item is _STOP:
+                    return
+                task, text, size = item
+                del item  # иначе кортеж держит исходный HTML до следующей страницы
+                soup = None
+                try:
+                    soup = BeautifulSoup(text, "html.parser")
+                    del text
+                    data, has_next = self.extract(soup, task.page_index)
+                except Exception as exc:
+                    logger.warning("Ошибка разбора %s: %s", task.url, exc)
+                    self._count("failed_pages")
+                    # как и при ошибке загрузки: страница не засчитывается, обход источника прекращается
+                    results.put(SourceDone(task.source_index, task.source, task.page_index - 1))
+                    continue
+                finally:
+                    if soup is not None:
+                        soup.decompose()  # дерево больше не нужно — рвём ссылки сразу
+                    self.budget.release(size)
+
+                self._count("pages")
+                results.put(PageResult(task.source_index, task.source, task.page_index, task.url, data))
+                next_task = None
+                if has_next:
+                    try:
+                        next_task = task._replace(
+                            page_index=task.page_index + 1,
+                            url=self.next_url(task.url, task.page_index + 1),
+                        )
+                    except Exception as exc:
+                        # страница уже отдана — источник завершается на ней
+                        logger.warning("Ошибка адреса следующей страницы %s: %s", task.url, exc)
+                if next_task is not None:
+                    tasks.put(next_task)
+                else:
+                    # SourceDone отдаётся всегда: без него run() ждал бы источник вечно
+                    results.put(SourceDone(task.source_index, task.source, task.page_index))
+
+    # ------------------------------------------------------------------ #
+    #                        Запуск и приёмник                            #
+    # ------------------------------------------------------------------ #
+    def run(self, sources: Iterable[str]) -> Iterator[PageResult | SourceDone]:
+        """
+        Обходит источники и отдаёт PageResult / SourceDone в порядке источников
+        (страницы — по порядку). Источники читаются лениво.
+        """
+        tasks: "queue.Queue" = queue.Queue()  # адреса страниц: мелкие, без ограничения
+        pages: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        results: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._fetch_loop, args=(tasks, pages, results), daemon=True)
+            for _ in range(self.fetch_workers)
+        ] + [
+            threading.Thread(target=self._parse_loop, args=(tasks, pages, results), daemon=True)
+            for _ in range(self.parse_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        source_iter = iter(sources)
+        exhausted = False
+        started = 0      # выдано источников
+        next_index = 0   # источник, чьи события отдаются сейчас
+        buffered: Dict[int, List[PageResult | SourceDone]] = {}
+
+        def _start_more() -> None:
+            nonlocal exhausted, started
+            # «активен» источник, пока его SourceDone не отдан приёмнику:
+            # так и буфер переупорядочивания ограничен max_active_sources
+            while not exhausted and started - next_index < self.max_active_sources:
+                source = next(source_iter, None)
+                if source is None:
+                    exhausted = True
+                    return
+                tasks.put(_PageTask(started, source, 1, self.first_url(source)))
+                started += 1
+
+        try:
+            _start_more()
+            while next_index < started:
+                event = self._next_event(results, threads)
+                buffered.setdefault(event.source_index, []).append(event)
+                # отдаём всё, что накопилось у текущего источника, по порядку
+                while next_index in buffered:
+                    events = buffered.pop(next_index)
+                    done = False
+                    for ready in events:
+                        yield ready
+                        done = isinstance(ready, SourceDone)
+                    if not done:
+                        break
+                    next_index += 1
+                    _start_more()
+        finally:
+            for _ in range(self.fetch_workers):
+                tasks.put(_STOP)
+            self._drain(pages, results, threads)
+            self.stats["bytes_fetched"] = self.budget.total
+            self.stats["peak_inflight_bytes"] = self.budget.peak
+
+    @staticmethod
+    def _next_event(results: "queue.Queue", threads: List[threading.Thread]) -> PageResult | SourceDone:
+        """Следующее событие стадий; если рабочий поток погиб, ошибка вместо вечного ожидания."""
+        while True:
+            try:
+                return results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(thread.is_alive() for thread in threads):
+                    raise RuntimeError("Рабочий поток конвейера завершился аварийно") from None
+
+    def _drain(self, pages: "queue.Queue", results: "queue.Queue", threads: List[threading.Thread]) -> None:
+        """Останавливает потоки; при досрочном выходе разгружает очереди, чтобы никто не завис на put()."""
+        fetchers, parsers = threads[: self.fetch_workers], threads[self.fetch_workers:]
+        for thread in fetchers:
+            while thread.is_alive():
+                _discard(pages, self.budget)
+                _discard(results)
+                thread.join(0.05)
+        for thread in parsers:
+            # разборщики могут стоять на put() в полную results — разгружаем её и докладываем
+            # сигналы остановки, пока есть место (лишние никому не мешают)
+            while thread.is_alive():
+                _discard(results)
+                try:
+                    pages.put_nowait(_STOP)
+                except queue.Full:
+                    pass
+                thread.join(0.05)
+
+
+def _discard(q: "queue.Queue", budget: Optional[ByteBudget] = None) -> None:
+    try:
+        while True:
+            item = q.get_nowait()
+            if budget is not None and isinstance(item, tuple) and len(item) == 3:
+                budget.release(item[2])
+    except queue.Empty:
+        pass
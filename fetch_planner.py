@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+__all__ = ["FetchPlan", "OUTPUT_FIELDS", "DEFAULT_FIELDS"]
+
+# Поля, которые пользователь может выбрать для результата
+OUTPUT_FIELDS: Tuple[str, ...] = (
+    "Товар", "Цена", "Артикул", "Бренд", "Наличие", "Описание", "Характеристики",
+)
+# Набор по умолчанию повторяет прежний вывод стартового парсера
+DEFAULT_FIELDS: Tuple[str, ...] = ("Товар", "Цена", "Артикул", "Описание", "Характеристики")
+
+# Поле результата → ключ строки листинга (ProductListParser._extract_row_data_v1/v2)
+_LISTING_KEYS: Dict[str, str] = {
+    "Товар": "Название",
+    "Цена": "Цена",
+    "Артикул": "Артикул",
+    "Бренд": "Бренд",
+    "Наличие": "Наличие",
+}
+# Поля, которые есть только на детальной странице (WebParser.parse_product)
+_DETAIL_ONLY: Tuple[str, ...] = ("Описание", "Характеристики")
+# Поля листинга, которые детальная страница умеет восполнить
+_DETAIL_FILLS: Tuple[str, ...] = ("Товар", "Цена", "Артикул")
+# Базовые ключи parse_product (всё остальное — характеристики)
+_DETAIL_BASE_KEYS: Tuple[str, ...] = ("Товар", "Цена", "Описание", "Артикул")
+
+LINK_KEY = "Ссылка"
+MISSING = "Н/Д"
+
+
+# ========================================================================= #
+#                           ПЛАН ЗАГРУЗКИ                                   #
+# ========================================================================= #
+class FetchPlan:
+    """
+    Решает, какие детальные страницы товаров действительно нужны.
+
+    Если выбраны только поля, которые уже есть в карточках листинга
+    (название, цена, артикул, бренд, наличие), детальные страницы не
+    загружаются вовсе; иначе — только для строк, где нужных полей нет
+    ('Н/Д'), а детальная страница может их дать.
+    """
+
+    def __init__(self, fields: Iterable[str] = DEFAULT_FIELDS) -> None:
+        self.fields: List[str] = list(dict.fromkeys(fields))
+        unknown = [f for f in self.fields if f not in OUTPUT_FIELDS]
+        if unknown:
+            raise ValueError("Неизвестные поля: " + ", ".join(unknown))
+        if not self.fields:
+            raise ValueError("Не выбрано ни одного поля")
+
+        self.listing_fields: List[str] = [f for f in self.fields if f in _LISTING_KEYS]
+        self.detail_only: List[str] = [f for f in self.fields if f in _DETAIL_ONLY]
+
+    # ------------------------------------------------------------------ #
+    @property
+    def always_needs_detail(self) -> bool:
+        """Выбраны поля, которые есть только на детальной странице."""
+        return bool(self.detail_only)
+
+    def describe(self) -> str:
+        if self.always_needs_detail:
+            return "детальные страницы нужны для всех товаров (" + ", ".join(self.detail_only) + ")"
+        return "достаточно данных листинга; детальные — только для строк с пропусками"
+
+    # ------------------------------------------------------------------ #
+    #                          Строки результата                          #
+    # ------------------------------------------------------------------ #
+    def row_from_listing(self, listing_row: Dict[str, str]) -> Dict[str, Any]:
+        """Строка результата из строки листинга (только выбранные поля + ссылка)."""
+        row: Dict[str, Any] = {LINK_KEY: listing_row.get(LINK_KEY, "")}
+        for field in self.listing_fields:
+            row[field] = listing_row.get(_LISTING_KEYS[field], MISSING)
+        if "Описание" in self.detail_only:
+            row["Описание"] = MISSING
+        return row
+
+    def row_from_link(self, link: str) -> Dict[str, Any]:
+        """Пустая строка результата, когда известна только ссылка (sitemap)."""
+        return self.row_from_listing({LINK_KEY: link})
+
+    def missing_fields(self, row: Dict[str, Any]) -> List[str]:
+        """Поля листинга с пропусками, которые может восполнить детальная страница."""
+        return [
+            f for f in self.listing_fields
+            if f in _DETAIL_FILLS and row.get(f, MISSING) == MISSING
+        ]
+
+    def needs_detail(self, row: Dict[str, Any]) -> bool:
+        if not row.get(LINK_KEY):
+            return False
+        return self.always_needs_detail or bool(self.missing_fields(row))
+
+    def merge_detail(self, row: Dict[str, Any], product: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Дополняет строку данными WebParser.parse_product() (только нужные поля).
+        Если детальная страница загружена, её значения главнее карточки листинга
+        (как в прежнем выводе); данные листинга остаются, только где на детальной 'Н/Д'.
+        """
+        for field in self.listing_fields:
+            if field in _DETAIL_FILLS:
+                value = product.get(field, MISSING)
+                if value != MISSING:
+                    row[field] = value
+        if "Описание" in self.detail_only:
+            row["Описание"] = product.get("Описание", MISSING)
+        if "Характеристики" in self.detail_only:
+            for key, value in product.items():
+                if key not in _DETAIL_BASE_KEYS:
+                    row[key] = value
+        return row
+
+    @staticmethod
+    def finalize(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Убирает служебную ссылку перед выгрузкой."""
+        row.pop(LINK_KEY, None)
+        return row
@@ -1,19 +1,58 @@
 from __future__ import annotations
 
+import csv
 import logging
 import re
 from collections import OrderedDict
-from io import BytesIO
+from contextlib import nullcontext
+from io import BytesIO, TextIOWrapper
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
-from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from typing import IO, Any, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 
 import pandas as pd
 from bs4 import BeautifulSoup, Tag
 
 from Parse import WebParser
+from crawl_pipeline import DEFAULT_INFLIGHT_BYTES, PagePipeline, PageResult
+from profiling import RunProfiler, as_profiler, profile_base_path
+from row_store import RowStore
+from transport import TransportError
+
+__all__ = ["ProductListParser", "make_unique_sheet_name"]
+
+# сколько некорректных ссылок сохраняем для отчёта (остальные только считаются)
+_MAX_INVALID_SAMPLES = 100
+
+
+def make_unique_sheet_name(title: str, used: Dict[str, int]) -> str:
+    """
+    Создаёт уникальное имя листа, учитывая ограничения Excel (≤31 символ).
+    used — уже выданные имена (пополняется).
+    """
+    # убираем запрещённые символы
+    safe = re.sub(r"[:\\/?*\[\]]", " ", title).strip()
+    if not safe:
+        safe = "Sheet"
+
+    base = safe[:31]  # предварительное обрезание до лимита
+    count = used.get(base, 0)
+
+    if count:
+        # если имя уже использовалось, добавляем суффикс _n
+        while True:
+            count += 1
+            suffix = f"_{count}"
+            candidate = (base[: 31 - len(suffix)]) + suffix
+            if candidate not in used:
+                safe = candidate
+                break
+    else:
+        safe = base
+
+    used[safe] = 1
+    return safe
 
-__all__ = ["ProductListParser"]
 
 # ========================================================================= #
 #                               КЛАСС                                        #
@@ -24,21 +63,41 @@ class ProductListParser:
     # ------------------------------------------------------------------ #
     def __init__(
         self,
-        links: List[str],
+        links: Iterable[str],
         output_file: str = "product_list.xlsx",
         base_parser: WebParser | None = None,
+        dedup_index: str = "set",
+        fetch_workers: int = 4,
+        parse_workers: int = 2,
+        max_inflight_bytes: int = DEFAULT_INFLIGHT_BYTES,
     ) -> None:
         self.logger: logging.Logger = self._configure_logger()
         self.parser: WebParser = base_parser or WebParser()
         self.output_file: str = output_file
 
-        self.links: List[str] = self.normalize_links(links)
-        self._validate_links()
-        self.logger.info("Принято %d ссылок", len(self.links))
+        # конвейер run(): загрузка → разбор → извлечение → RowStore
+        self.fetch_workers: int = fetch_workers
+        self.parse_workers: int = parse_workers
+        self.max_inflight_bytes: int = max_inflight_bytes
 
-        # вспомогательные структуры для формирования Excel
+        # новый прогон — новый индекс просмотренных URL ('set' или 'bloom')
+        self.parser.reset_seen_index(dedup_index)
+
+        # ссылки потребляются лениво в run(): обход начинается сразу,
+        # без предварительной загрузки и проверки всего списка
+        self.invalid_count: int = 0
+        self.invalid_links: List[str] = []
+        self.links: Iterator[str] = self._iter_valid_links(links)
+
+        # вспомогательные структуры для формирования Excel:
+        # все строки лежат в одном колоночном хранилище, лист = диапазон строк
         self._sheet_name_counts: Dict[str, int] = {}
-        self._sheet_data: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.rows: RowStore = RowStore()
+        self._sheet_data: "OrderedDict[str, range]" = OrderedDict()
+
+        # профилирование по запросу: run(profile=...) + save_results()
+        self.profiler: RunProfiler | None = None
+        self.profile_artifacts: List[Path] = []
 
     # ------------------------------------------------------------------ #
     #                         Логирование                                #
@@ -62,57 +121,106 @@ class ProductListParser:
     #                   Утилита нормализации ссылок                       #
     # ------------------------------------------------------------------ #
     @staticmethod
-    def normalize_links(raw_links: List[str]) -> List[str]:
+    def iter_normalized_links(raw_links: Iterable[str]) -> Iterator[str]:
         """
-        Очистка ссылок: удаление пустых строк/пробелов, добавление http/https,
-        удаление завершающего слеша, устранение дубликатов c сохранением порядка.
+        Ленивая очистка ссылок: удаление пустых строк/пробелов, добавление http/https,
+        удаление завершающего слеша. Повторы здесь не отсеиваются: это делает
+        индекс просмотренных URL (canonicalize_url) — с учётом всех вариантов записи
+        и без отдельного множества всех входных ссылок.
         """
-        cleaned: List[str] = []
-        seen: set[str] = set()
         for item in raw_links:
             link = item.strip()
             if not link:
                 continue
             if not re.match(r"^https?://", link, flags=re.IGNORECASE):
                 link = "http://" + link
-            link = link.rstrip("/")
-            if link not in seen:
-                cleaned.append(link)
-                seen.add(link)
-        return cleaned
+            yield link.rstrip("/")
+
+    @classmethod
+    def normalize_links(cls, raw_links: Iterable[str]) -> List[str]:
+        """Списочный вариант iter_normalized_links()."""
+        return list(cls.iter_normalized_links(raw_links))
+
+    # ------------------------------------------------------------------ #
+    #                   Чтение ссылок из файла                            #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def iter_links_from_file(stream: IO[bytes], filename: str) -> Iterator[str]:
+        """
+        Потоково читает ссылки из загруженного файла (CSV / XLSX / TXT).
+        Из каждой строки берётся первая непустая ячейка; строка-заголовок
+        (первая ячейка без точки, например «url») пропускается, прочий мусор
+        отсеивается на этапе валидации, не прерывая обработку остальных строк.
+        """
+        suffix = Path(filename).suffix.lower()
+
+        if suffix == ".xlsx":
+            from openpyxl import load_workbook  # нужен только для XLSX
+
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+            try:
+                for sheet in workbook.worksheets:
+                    for row_index, values in enumerate(sheet.iter_rows(values_only=True)):
+                        for cell in values:
+                            if cell is not None and str(cell).strip():
+                                if row_index or "." in str(cell):
+                                    yield str(cell)
+                                break
+            finally:
+                workbook.close()
+            return
+
+        text = TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            if suffix == ".csv":
+                sample = text.read(4096)
+                text.seek(0)
+                try:
+                    dialect: Any = csv.Sniffer().sniff(sample, delimiters=",;\t")
+                except csv.Error:
+                    dialect = csv.excel
+                for row_index, values in enumerate(csv.reader(text, dialect)):
+                    for cell in values:
+                        if cell.strip():
+                            if row_index or "." in cell:
+                                yield cell
+                            break
+            else:
+                for line in text:
+                    if line.strip():
+                        yield line
+        finally:
+            text.detach()  # поток принадлежит вызывающему коду
 
     # ------------------------------------------------------------------ #
     #            Валидация URL         #
     # ------------------------------------------------------------------ #
-    def _validate_links(self) -> None:
+    _URL_RE = re.compile(r"^https?://[\w\-.:/?#=&%~+]+$", re.IGNORECASE)
+
+    def _iter_valid_links(self, raw_links: Iterable[str]) -> Iterator[str]:
             """
-            Проверяет корректность URL и приводит каждую ссылку к нормализованному виду,
+            Лениво проверяет корректность URL и приводит каждую ссылку к нормализованному виду,
             НЕ навязывая items_per_page. Параметры запроса сохраняются как есть.
+            Некорректная ссылка отбрасывается и учитывается в self.invalid_count,
+            остальные продолжают обрабатываться. Повторы категории (другая схема,
+            порядок query, /page-N/, завершающий '/') отсекаются общим индексом
+            self.parser.seen по каноническому виду первой страницы.
             Дополнительная нормализация под пагинацию выполняется в _normalize_to_first_page().
             """
-            if not self.links:
-                raise ValueError(
-                    "Список ссылок пуст или содержит только невалидные элементы."
-                )
-
-            url_re = re.compile(r"^https?://[\w\-.:/?#=&%~+]+$", re.IGNORECASE)
-            invalid: List[str] = []
-            processed: List[str] = []
+            for url in self.iter_normalized_links(raw_links):
+                if not self._URL_RE.match(url):
+                    self.invalid_count += 1
+                    if len(self.invalid_links) < _MAX_INVALID_SAMPLES:
+                        self.invalid_links.append(url)
+                    self.logger.warning("Пропущен некорректный URL: %s", url)
+                    continue
 
-            for url in self.links:
-                if not url_re.match(url):
-                    invalid.append(url)
+                if not self.parser.seen.add(self._normalize_to_first_page(url)):
+                    self.logger.info("Пропущен повтор категории: %s", url)
                     continue
 
                 # Сохраняем URL без принудительных правок query; только пересобираем обратно
-                parsed = urlparse(url)
-                new_url = urlunparse(parsed)
-                processed.append(new_url)
-
-            if invalid:
-                raise ValueError("Обнаружены некорректные URL: " + ", ".join(invalid))
-
-            self.links = processed  # сохраняем нормализованные ссылки без вмешательства в query
+                yield urlunparse(urlparse(url))
 
     # ------------------------------------------------------------------ #
     #                   НОРМАЛИЗАЦИЯ И ПАГИНАЦИЯ                         #
@@ -159,14 +267,43 @@ class ProductListParser:
                 yield page, url, soup
 
                 # если есть блок "показать ещё" — есть следующая страница
-                show_more = soup.select_one("div.cnc-pagination__show-more")
+                show_more = self._has_next_page(soup)
+                soup.decompose()  # дерево страницы больше не нужно — освобождаем до следующей загрузки
                 if not show_more:
                     return
 
                 page += 1
-                parsed = urlparse(url)
-                next_path = re.sub(r"/page-\d+/", f"/page-{page}/", parsed.path)
-                url = urlunparse(parsed._replace(path=next_path))
+                url = self._next_page_url(url, page)
+
+    @staticmethod
+    def _has_next_page(soup: BeautifulSoup) -> bool:
+        return soup.select_one("div.cnc-pagination__show-more") is not None
+
+    @staticmethod
+    def _next_page_url(url: str, page: int) -> str:
+        """Адрес страницы page той же категории (/page-N/ → /page-page/)."""
+        parsed = urlparse(url)
+        next_path = re.sub(r"/page-\d+/", f"/page-{page}/", parsed.path)
+        return urlunparse(parsed._replace(path=next_path))
+
+    # ------------------------------------------------------------------ #
+    #             Стадии конвейера run() (вызываются из потоков)          #
+    # ------------------------------------------------------------------ #
+    def _fetch_page_text(self, url: str) -> str | None:
+        """Стадия загрузки: HTML страницы без разбора (None — ошибка)."""
+        self.logger.info("Загружаем страницу: %s", url)
+        try:
+            return self.parser.transport.get_text(url)
+        except TransportError as e:
+            self.logger.warning("Ошибка загрузки страницы %s: %s", url, e)
+            return None
+
+    def _extract_listing_page(
+        self, soup: BeautifulSoup, page_index: int
+    ) -> Tuple[Tuple[str | None, List[Dict[str, str]]], bool]:
+        """Стадия извлечения: ((заголовок с первой страницы, строки), есть ли следующая)."""
+        title = self._extract_page_title(soup) if page_index == 1 else None
+        return (title, self._parse_category_page(soup)), self._has_next_page(soup)
 
 
     # ------------------------------------------------------------------ #
@@ -199,29 +336,8 @@ class ProductListParser:
         return self._clean_text(tag.get_text()) if tag else "Категория"
 
     def _make_unique_sheet_name(self, title: str) -> str:
-        """Создаёт уникальное имя листа, учитывая ограничения Excel (≤31 символ)."""
-        # убираем запрещённые символы
-        safe = re.sub(r"[:\\/?*\[\]]", " ", title).strip()
-        if not safe:
-            safe = "Sheet"
-
-        base = safe[:31]  # предварительное обрезание до лимита
-        count = self._sheet_name_counts.get(base, 0)
-
-        if count:
-            # если имя уже использовалось, добавляем суффикс _n
-            while True:
-                count += 1
-                suffix = f"_{count}"
-                candidate = (base[: 31 - len(suffix)]) + suffix
-                if candidate not in self._sheet_name_counts:
-                    safe = candidate
-                    break
-        else:
-            safe = base
-
-        self._sheet_name_counts[safe] = 1
-        return safe
+        """Создаёт уникальное имя листа, учитывая ограничения Excel (≤31 символ)."""
+        return make_unique_sheet_name(title, self._sheet_name_counts)
 
     # ------------------------------------------------------------------ #
     #                         EXTRACTORS (v1)                            #
@@ -232,11 +348,13 @@ class ProductListParser:
         if not name_td or not name_td.a:
             return None
         name = self._clean_text(name_td.a.get_text())
+        link = name_td.a.get("href", "")
 
         brand_td = name_td.find("span", class_="cnc-product-categories-mob-card__brand")
         brand = self._clean_text(brand_td.get_text()) if brand_td else "Н/Д"
 
         article_span = row.find("span", class_="cnc-product-categories-mob-card__sku")
+        article_block = None
         if article_span:
             article_block=article_span.select_one("span.cnc-sku__product-code")
         article = (
@@ -257,6 +375,7 @@ class ProductListParser:
             "Артикул": article,
             "Цена": price,
             "Наличие": availability,
+            "Ссылка": link,  # в Excel не выгружается (нет в колонках RowStore)
         }
 
     # ------------------------------------------------------------------ #
@@ -266,6 +385,7 @@ class ProductListParser:
         """Блочная верстка (v2). Принимает <div class="cnc-short-list-product">."""
         if not name_div or not name_div.a:
             return None
+        link = name_div.a.get("href", "")
         name_place = name_div.find_next("div", class_="cnc-short-list-product__info")
         name = self._clean_text(name_place.a.get_text())
 
@@ -296,6 +416,7 @@ class ProductListParser:
             "Артикул": article,
             "Цена": price,
             "Наличие": availability,
+            "Ссылка": link,  # в Excel не выгружается (нет в колонках RowStore)
         }
 
     # ------------------------------------------------------------------ #
@@ -321,57 +442,134 @@ class ProductListParser:
                 products.append(data)
         return products
 
+    def crawl_category(self, base_url: str) -> Tuple[str | None, List[Dict[str, str]]]:
+        """
+        Обходит все страницы одной категории.
+        Возвращает (заголовок категории, строки); заголовок None — не загрузилась
+        ни одна страница. 'Ссылка' в строках — абсолютная (от адреса страницы).
+        """
+        title: str | None = None
+        rows: List[Dict[str, str]] = []
+        for page_index, page_url, soup in self._iter_paginated_pages(base_url):
+            if title is None:
+                title = self._extract_page_title(soup)
+            products = self._parse_category_page(soup)
+            self.logger.info("  └— товаров на странице %d: %d", page_index, len(products))
+            for row in products:
+                if row.get("Ссылка"):
+                    row["Ссылка"] = urljoin(page_url, row["Ссылка"])
+            rows.extend(products)
+        return title, rows
+
+    def iter_listing_rows(self, base_url: str) -> Iterator[Dict[str, str]]:
+        """
+        Строки листинга одной категории (все страницы) вместе с абсолютной
+        ссылкой на карточку товара в ключе 'Ссылка' (относительные href
+        разрешаются от адреса страницы). Карточки без ссылки и товары, уже
+        встреченные в этом прогоне (общий индекс self.parser.seen), пропускаются.
+        """
+        for page_index, page_url, soup in self._iter_paginated_pages(base_url):
+            products = self._parse_category_page(soup)
+            self.logger.info("  └— товаров на странице %d: %d", page_index, len(products))
+            for row in products:
+                href = row.get("Ссылка")
+                link = urljoin(page_url, href) if href else ""
+                if not link.startswith("http"):
+                    self.logger.warning("Пропущена карточка без ссылки: %s", row.get("Название"))
+                    continue
+                if not self.parser.seen.add(link):
+                    continue
+                row["Ссылка"] = link
+                yield row
+
     # ------------------------------------------------------------------ #
     #                      Основной метод run()                          #
     # ------------------------------------------------------------------ #
-    def run(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    def run(self, profile: str | RunProfiler | None = None) -> Tuple[RowStore, Dict[str, Any]]:
             """
             Обходит все ВХОДНЫЕ ссылки категорий.
             Для каждой ссылки последовательно загружает /page-1/, /page-2/, ...
             пока на странице присутствует div.cnc-pagination__show-more.
             Все страницы одной категории агрегируются в ОДИН лист Excel.
+            Строки складываются в колоночное хранилище self.rows (RowStore).
+
+            profile — режим профилирования ('cprofile' / 'sampling') или RunProfiler.
+            Профиль продолжается в save_results(); артефакты сохраняются рядом
+            с output_file (self.profile_artifacts).
+            """
+            self.profiler = as_profiler(profile)
+            with self.profiler or nullcontext():
+                result = self._crawl_links()
+            self._save_profile()
+            return result
+
+    def _crawl_links(self) -> Tuple[RowStore, Dict[str, Any]]:
+            """
+            Тело run(): обход категорий конвейером PagePipeline.
+            Загрузка и разбор идут в потоках с ограниченными очередями и бюджетом
+            байт; здесь — стадия приёмника: события приходят в порядке входных
+            ссылок, поэтому строки категории лежат в RowStore одним диапазоном.
             """
-            all_products: List[Dict[str, Any]] = []
             failed_links: List[str] = []
             success_categories = 0
+            total_links = 0
+            products_before = len(self.rows)
+
+            pipeline = PagePipeline(
+                fetch=self._fetch_page_text,
+                extract=self._extract_listing_page,
+                next_url=self._next_page_url,
+                first_url=self._normalize_to_first_page,
+                fetch_workers=self.fetch_workers,
+                parse_workers=self.parse_workers,
+                max_inflight_bytes=self.max_inflight_bytes,
+                profiler=self.profiler,
+            )
+            category_start = len(self.rows)
+            first_title: str | None = None
 
-            for base_url in self.links:
-                category_rows: List[Dict[str, Any]] = []
-                first_title: str | None = None
-                success_any_page = False
-
-                for page_index, page_url, soup in self._iter_paginated_pages(base_url):
+            for event in pipeline.run(self.links):
+                if isinstance(event, PageResult):
+                    title, products = event.data
                     if first_title is None:
-                        first_title = self._extract_page_title(soup)
-
-                    products = self._parse_category_page(soup)
-                    self.logger.info("  └— товаров на странице %d: %d", page_index, len(products))
-                    category_rows.extend(products)
-                    all_products.extend(products)
-                    success_any_page = True
+                        first_title = title
+                    self.logger.info("  └— товаров на странице %d: %d", event.page_index, len(products))
+                    self.rows.extend(products)
+                    continue
 
-                if success_any_page:
+                # SourceDone: категория обойдена (pages == 0 — не загрузилась ни одна страница)
+                total_links += 1
+                if event.pages:
                     # один лист на весь URL категории
-                    title_for_sheet = first_title or base_url
+                    title_for_sheet = first_title or event.source
                     sheet_name = self._make_unique_sheet_name(title_for_sheet)
-                    self._sheet_data[sheet_name] = category_rows
+                    self._sheet_data[sheet_name] = range(category_start, len(self.rows))
                     success_categories += 1
                 else:
-                    failed_links.append(base_url)
+                    failed_links.append(event.source)
+                category_start = len(self.rows)
+                first_title = None
 
             stats = {
-                "total": len(self.links),
+                "total": total_links,
                 "success": success_categories,   # успешно обработанные категории (URL)
                 "failed": len(failed_links),
                 "failed_links": failed_links,
-                "total_products": len(all_products),
+                "total_products": len(self.rows) - products_before,
+                "invalid": self.invalid_count,
+                "invalid_links": list(self.invalid_links),
+                "dedup_hits": self.parser.seen.hits,
+                "pages": pipeline.stats["pages"],
+                "peak_inflight_bytes": pipeline.stats["peak_inflight_bytes"],
             }
             self.logger.info(
                 "Итого | категорий: %(total)d | успех: %(success)d "
-                "| ошибок: %(failed)d | товаров: %(total_products)d",
+                "| ошибок: %(failed)d | некорректных: %(invalid)d "
+                "| повторов: %(dedup_hits)d | товаров: %(total_products)d "
+                "| страниц: %(pages)d | пик в полёте: %(peak_inflight_bytes)d Б",
                 stats,
             )
-            return all_products, stats
+            return self.rows, stats
 
 
     # ------------------------------------------------------------------ #
@@ -385,12 +583,18 @@ class ProductListParser:
         if not self._sheet_data:
             raise RuntimeError("Нет данных для сохранения. Сначала вызовите run().")
 
+        with self.profiler or nullcontext():
+            content = self._write_excel()
+        self._save_profile()
+        return content
+
+    def _write_excel(self) -> bytes:
         self.logger.info("Сохраняем результаты в %s", self.output_file)
         buffer = BytesIO()
 
         with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
             for sheet_name, rows in self._sheet_data.items():
-                df = pd.DataFrame(rows)
+                df = self.rows.to_dataframe(rows)
                 # листы Excel не должны быть пустыми — проверяем
                 if df.empty:
                     df = pd.DataFrame({"Нет данных": []})
@@ -406,3 +610,15 @@ class ProductListParser:
         )
         buffer.seek(0)
         return buffer.getvalue()
+
+    def _save_profile(self) -> None:
+        """Перезаписывает артефакты профиля (накапливается за run() и save_results())."""
+        if self.profiler is None:
+            return
+        self.profile_artifacts = self.profiler.save(profile_base_path(self.output_file))
+        self.logger.info(
+            "Профиль (%s, %.2f с) сохранён: %s",
+            self.profiler.mode,
+            self.profiler.elapsed,
+            ", ".join(p.name for p in self.profile_artifacts),
+        )
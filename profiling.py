@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+__all__ = ["PROFILE_MODES", "RunProfiler", "as_profiler", "profile_base_path"]
+
+# 'cprofile'  — детерминированный профилировщик: точные числа вызовов, артефакт .prof (pstats)
+# 'sampling'  — сэмплирование стека потока: малые накладные расходы,
+#               артефакты .speedscope.json и .folded (вход для flamegraph.pl / inferno → SVG)
+PROFILE_MODES: Tuple[str, ...] = ("cprofile", "sampling")
+
+_Frame = Tuple[str, str, int]  # (функция, файл, строка определения)
+
+
+# ========================================================================= #
+#                          ПРОФИЛИРОВЩИК ПРОГОНА                            #
+# ========================================================================= #
+class RunProfiler:
+    """
+    Профилирование прогона по запросу. Используется как контекстный
+    менеджер; повторные входы накапливают данные в одном профиле
+    (например, run() + save_results()). Профилируется поток, вошедший
+    в контекст, и рабочие потоки, подключённые через attach_thread().
+    """
+
+    def __init__(self, mode: str = "cprofile", interval: float = 0.005) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode!r} (ожидается {PROFILE_MODES})")
+        self.mode = mode
+        self.interval = interval
+        self.elapsed = 0.0
+        self._depth = 0
+        self._started = 0.0
+        # cprofile
+        self._profile: Optional[cProfile.Profile] = cProfile.Profile() if mode == "cprofile" else None
+        self._thread_profiles: List[cProfile.Profile] = []
+        # sampling
+        self._samples: Counter = Counter()  # стек (от корня к листу) → секунды
+        self._targets: set = set()  # идентификаторы профилируемых потоков
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ #
+    #                          Старт / остановка                          #
+    # ------------------------------------------------------------------ #
+    def __enter__(self) -> "RunProfiler":
+        self._depth += 1
+        if self._depth == 1:
+            self._started = time.perf_counter()
+            if self._profile is not None:
+                self._profile.enable()
+            else:
+                self._targets.add(threading.get_ident())
+                self._stop.clear()
+                self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+                self._sampler.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            if self._profile is not None:
+                self._profile.disable()
+            else:
+                self._stop.set()
+                self._sampler.join()
+                self._sampler = None
+                self._targets.discard(threading.get_ident())
+            self.elapsed += time.perf_counter() - self._started
+
+    @contextmanager
+    def attach_thread(self) -> Iterator[None]:
+        """
+        Подключает текущий (рабочий) поток к активному профилю.
+        cProfile работает на поток — у потока свой Profile, при выгрузке
+        статистика объединяется; сэмплер просто добавляет поток в цели.
+        Вне активного профиля ничего не делает.
+        """
+        if self._depth == 0:
+            yield
+            return
+        ident = threading.get_ident()
+        if self._profile is None:
+            self._targets.add(ident)
+            try:
+                yield
+            finally:
+                self._targets.discard(ident)
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # другой профилировщик уже активен в интерпретаторе
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._thread_profiles.append(profile)
+
+    def _sample_loop(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for ident in list(self._targets):
+                frame = frames.get(ident)
+                stack: List[_Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    # вес — реальное время с прошлого сэмпла (интервал «плавает» под GIL)
+                    self._samples[tuple(stack)] += now - last
+            last = now
+
+    def _pstats(self) -> pstats.Stats:
+        """Статистика cProfile основного и подключённых потоков."""
+        stats = pstats.Stats(self._profile)
+        for profile in self._thread_profiles:
+            stats.add(profile)
+        return stats
+
+    # ------------------------------------------------------------------ #
+    #                           Горячие функции                           #
+    # ------------------------------------------------------------------ #
+    def top_functions(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Топ функций по собственному времени (без учёта вызываемых)."""
+        if self._profile is not None:
+            stats = self._pstats().stats
+            items = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:limit]
+            return [
+                {
+                    "Функция": _frame_label(func),
+                    "Вызовов": calls,
+                    "Собств., с": round(self_time, 4),
+                    "Всего, с": round(total_time, 4),
+                }
+                for func, (_, calls, self_time, total_time, _) in items
+            ]
+
+        self_times: Counter = Counter()
+        total_times: Counter = Counter()
+        for stack, seconds in self._samples.items():
+            self_times[stack[-1]] += seconds
+            for frame in set(stack):  # рекурсия не должна удваивать время
+                total_times[frame] += seconds
+        return [
+            {
+                "Функция": _frame_label(frame),
+                "Собств., с": round(seconds, 4),
+                "Всего, с": round(total_times[frame], 4),
+            }
+            for frame, seconds in self_times.most_common(limit)
+        ]
+
+    # ------------------------------------------------------------------ #
+    #                              Артефакты                              #
+    # ------------------------------------------------------------------ #
+    def save(self, base_path: str | Path) -> List[Path]:
+        """
+        Сохраняет артефакты профиля рядом с результатом:
+        <base>.prof для cprofile; <base>.speedscope.json и <base>.folded для sampling.
+        """
+        base = Path(base_path)
+        if self._profile is not None:
+            path = base.with_name(base.name + ".prof")
+            self._pstats().dump_stats(path)
+            return [path]
+
+        frames: List[_Frame] = []
+        frame_ids: Dict[_Frame, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        folded: List[str] = []
+        for stack, seconds in self._samples.items():
+            ids = []
+            for frame in stack:
+                if frame not in frame_ids:
+                    frame_ids[frame] = len(frames)
+                    frames.append(frame)
+                ids.append(frame_ids[frame])
+            samples.append(ids)
+            weights.append(seconds)
+            folded.append(
+                ";".join(_frame_label(f) for f in stack) + f" {max(1, round(seconds * 1000))}"
+            )
+
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": n, "file": f, "line": ln} for n, f, ln in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": base.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": base.name,
+            "exporter": "streamlit-parser",
+        }
+        json_path = base.with_name(base.name + ".speedscope.json")
+        json_path.write_text(json.dumps(speedscope, ensure_ascii=False), encoding="utf-8")
+        folded_path = base.with_name(base.name + ".folded")
+        folded_path.write_text("\n".join(folded) + "\n", encoding="utf-8")
+        return [json_path, folded_path]
+
+
+def _frame_label(frame: Tuple[str, int, str] | _Frame) -> str:
+    """'функция (файл:строка)' для обоих форматов ключей (pstats: файл, строка, функция)."""
+    if isinstance(frame[1], int):  # ключ pstats
+        filename, line, name = frame
+    else:
+        name, filename, line = frame
+    if filename == "~":  # встроенные функции
+        return name
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def as_profiler(profile: "str | RunProfiler | None") -> Optional[RunProfiler]:
+    """Флаг профилирования API: None/'' — выключено, режим или готовый профилировщик."""
+    if not profile:
+        return None
+    return profile if isinstance(profile, RunProfiler) else RunProfiler(profile)
+
+
+def profile_base_path(output_file: str | Path) -> Path:
+    """products.xlsx → products.profile (артефакты кладутся рядом с результатом)."""
+    path = Path(output_file)
+    return path.with_name(path.stem + ".profile")
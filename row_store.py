@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["RowStore", "LISTING_COLUMNS"]
+
+# Колонки строки листинга категории (порядок = порядок столбцов в Excel)
+LISTING_COLUMNS: Tuple[str, ...] = ("Название", "Бренд", "Артикул", "Цена", "Наличие")
+
+# Колонки с малым числом уникальных значений — хранятся словарным кодированием
+_ENCODED_COLUMNS: Tuple[str, ...] = ("Бренд", "Наличие")
+
+
+# ========================================================================= #
+#                        СЛОВАРЬ ЗНАЧЕНИЙ (интернирование)                  #
+# ========================================================================= #
+class _ValuePool:
+    """Словарь «строка → код»: каждое уникальное значение хранится один раз."""
+
+    __slots__ = ("values", "_index")
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._index[value] = code
+        return code
+
+
+# ========================================================================= #
+#                        КОЛОНОЧНОЕ ХРАНИЛИЩЕ СТРОК                         #
+# ========================================================================= #
+class RowStore:
+    """
+    Компактное колоночное хранилище строк листинга.
+
+    Вместо списка словарей (по словарю на строку) каждая колонка хранится
+    отдельным списком. Бренд и наличие кодируются через общий словарь
+    значений и лежат в ``array('i')`` — по 4 байта на строку.
+    Строки можно итерировать как словари (обратная совместимость),
+    но для экспорта следует использовать ``to_dataframe()``.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str] = LISTING_COLUMNS,
+        encoded: Sequence[str] = _ENCODED_COLUMNS,
+    ) -> None:
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self._pools: Dict[str, _ValuePool] = {
+            name: _ValuePool() for name in encoded if name in self.columns
+        }
+        self._codes: Dict[str, array] = {name: array("i") for name in self._pools}
+        self._plain: Dict[str, List[str]] = {
+            name: [] for name in self.columns if name not in self._pools
+        }
+        self._size = 0
+
+    # ------------------------------------------------------------------ #
+    #                            Запись                                   #
+    # ------------------------------------------------------------------ #
+    def append(self, row: Mapping[str, str]) -> None:
+        """Добавляет одну строку; отсутствующие поля заполняются 'Н/Д'."""
+        for name, pool in self._pools.items():
+            self._codes[name].append(pool.encode(row.get(name, "Н/Д")))
+        for name, values in self._plain.items():
+            values.append(row.get(name, "Н/Д"))
+        self._size += 1
+
+    def extend(self, rows: Iterable[Mapping[str, str]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    # ------------------------------------------------------------------ #
+    #                            Чтение                                   #
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return self._size
+
+    def row(self, index: int) -> Dict[str, str]:
+        """Материализует одну строку в виде словаря."""
+        result: Dict[str, str] = {}
+        for name in self.columns:
+            if name in self._pools:
+                result[name] = self._pools[name].values[self._codes[name][index]]
+            else:
+                result[name] = self._plain[name][index]
+        return result
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for index in range(self._size):
+            yield self.row(index)
+
+    def column(self, name: str, rows: range | None = None) -> List[str]:
+        """Возвращает значения одной колонки (декодированные)."""
+        rows = rows if rows is not None else range(self._size)
+        if name in self._pools:
+            values = self._pools[name].values
+            codes = self._codes[name]
+            return [values[codes[i]] for i in rows]
+        return self._plain[name][rows.start:rows.stop]
+
+    def to_dataframe(self, rows: range | None = None) -> pd.DataFrame:
+        """
+        Строит DataFrame напрямую из колонок, без промежуточных словарей.
+        Кодированные колонки передаются как pandas.Categorical.
+        """
+        rows = rows if rows is not None else range(self._size)
+        data: Dict[str, object] = {}
+        for name in self.columns:
+            if name in self._pools:
+                codes = np.frombuffer(self._codes[name], dtype=np.int32)
+                data[name] = pd.Categorical.from_codes(
+                    codes[rows.start:rows.stop],
+                    categories=self._pools[name].values,
+                )
+            else:
+                data[name] = self._plain[name][rows.start:rows.stop]
+        return pd.DataFrame(data, columns=list(self.columns))
+
+    # ------------------------------------------------------------------ #
+    #                         Диагностика                                 #
+    # ------------------------------------------------------------------ #
+    def memory_usage(self) -> int:
+        """Приблизительный объём памяти хранилища в байтах (включая строки)."""
+        total = 0
+        for name, values in self._plain.items():
+            total += sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+        for name, pool in self._pools.items():
+            total += sys.getsizeof(self._codes[name])
+            total += sys.getsizeof(pool.values) + sys.getsizeof(pool._index)
+            total += sum(sys.getsizeof(v) for v in pool.values)
+        return total
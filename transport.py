@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = ["TransportError", "RequestsTransport", "Http2Transport", "make_transport"]
+
+
+class TransportError(Exception):
+    """Ошибка загрузки (сеть, таймаут, HTTP-статус), не зависящая от бэкенда."""
+
+
+# ========================================================================= #
+#                      HTTP/1.1 — requests.Session                          #
+# ========================================================================= #
+class RequestsTransport:
+    """
+    Транспорт по умолчанию: requests.Session поверх HTTP/1.1.
+    Пул соединений настраивается через pool_maxsize (keep-alive на хост).
+    """
+
+    name = "http1"
+
+    def __init__(
+        self,
+        headers: Mapping[str, str],
+        pool_maxsize: int = 10,
+        timeout: float = 30.0,
+        verify: bool = True,
+    ) -> None:
+        self.timeout = timeout
+        self.verify = verify  # передаётся в каждый запрос: REQUESTS_CA_BUNDLE перекрывает session.verify
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats: Dict[str, int] = {"requests": 0, "bytes_received": 0}
+
+    def get_text(self, url: str) -> str:
+        """Загружает страницу целиком и возвращает декодированный текст."""
+        try:
+            response = self.session.get(url, timeout=self.timeout, verify=self.verify)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        self._account(response)
+        response.encoding = response.apparent_encoding
+        return response.text
+
+    def get_many(self, urls: Sequence[str], concurrency: int = 8) -> List[Optional[str]]:
+        """
+        Загружает пачку страниц параллельно (пул потоков поверх общей сессии).
+        Порядок результатов совпадает с urls; при ошибке — None.
+        """
+        def _one(url: str) -> Optional[str]:
+            try:
+                return self.get_text(url)
+            except TransportError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            return list(pool.map(_one, urls))
+
+    @contextmanager
+    def open_stream(self, url: str) -> Iterator[Tuple[IO[bytes], Mapping[str, str]]]:
+        """Открывает потоковое чтение тела ответа (уже без Content-Encoding)."""
+        try:
+            response = self.session.get(
+                url, stream=True, timeout=self.timeout, verify=self.verify
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        try:
+            response.raw.decode_content = True
+            yield response.raw, response.headers
+        finally:
+            self._account(response)
+            response.close()
+
+    def _account(self, response: requests.Response) -> None:
+        self.stats["requests"] += 1
+        # tell() у urllib3 — число байт, прочитанных из сокета (до распаковки)
+        self.stats["bytes_received"] += response.raw.tell() if response.raw else 0
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# ========================================================================= #
+#                  HTTP/2 — httpx.Client (мультиплексирование)              #
+# ========================================================================= #
+class Http2Transport:
+    """
+    Транспорт на httpx с HTTP/2: запросы к одному хосту мультиплексируются
+    в одном соединении, сжатие brotli/gzip согласуется автоматически
+    (brotli — при установленном пакете brotli).
+    Требует `pip install httpx[http2,brotli]`.
+
+    Все запросы идут через один httpx.AsyncClient в фоновом цикле событий:
+    синхронные вызовы из любых потоков (get_text, open_stream) отправляют
+    корутины в этот цикл и ждут результат, поэтому одновременные вызовы
+    из рабочих потоков становятся потоками одного HTTP/2-соединения.
+    """
+
+    name = "http2"
+
+    def __init__(
+        self,
+        headers: Mapping[str, str],
+        pool_maxsize: int = 10,
+        timeout: float = 30.0,
+        keepalive_expiry: float = 30.0,
+        verify: bool = True,
+    ) -> None:
+        try:
+            import httpx
+        except ImportError as e:  # pragma: no cover - зависит от окружения
+            raise ImportError(
+                "Для транспорта HTTP/2 установите httpx: pip install 'httpx[http2,brotli]'"
+            ) from e
+
+        self._httpx = httpx
+        logging.getLogger("httpx").setLevel(logging.WARNING)  # без строки в лог на каждый запрос
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="Http2Transport", daemon=True
+        )
+        self._loop_thread.start()
+        # синхронное HTTP/2-соединение httpcore нельзя делить между потоками
+        # (гонки в состоянии h2), асинхронное живёт в одном потоке цикла
+        self.session = httpx.AsyncClient(
+            http2=True,
+            headers=dict(headers),
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        self.stats: Dict[str, int] = {"requests": 0, "bytes_received": 0}  # меняется только в цикле
+
+    def _call(self, coro):
+        """Выполняет корутину в цикле транспорта и ждёт результат в текущем потоке."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_text(self, url: str) -> str:
+        return self._call(self._get_text(url))
+
+    async def _get_text(self, url: str) -> str:
+        try:
+            response = await self.session.get(url)
+            response.raise_for_status()
+        except self._httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        self._account(response)
+        return response.text
+
+    def get_many(self, urls: Sequence[str], concurrency: int = 8) -> List[Optional[str]]:
+        """
+        Загружает пачку страниц параллельно: до concurrency потоков HTTP/2
+        мультиплексируются в одном соединении.
+        Порядок результатов совпадает с urls; при ошибке — None.
+        """
+        async def _run() -> List[Optional[str]]:
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+
+            async def _one(url: str) -> Optional[str]:
+                async with semaphore:
+                    try:
+                        return await self._get_text(url)
+                    except TransportError:
+                        return None
+
+            return await asyncio.gather(*(_one(url) for url in urls))
+
+        return self._call(_run())
+
+    @contextmanager
+    def open_stream(self, url: str) -> Iterator[Tuple[IO[bytes], Mapping[str, str]]]:
+        response = self._call(self._open_stream(url))
+        chunks = response.aiter_bytes()
+        try:
+            yield _IterBytesReader(self._iter_chunks(chunks)), response.headers
+        finally:
+            self._call(self._close_stream(response, chunks))
+
+    async def _open_stream(self, url: str):
+        try:
+            response = await self.session.send(self.session.build_request("GET", url), stream=True)
+        except self._httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        try:
+            response.raise_for_status()
+        except self._httpx.HTTPError as e:
+            await response.aclose()
+            raise TransportError(str(e)) from e
+        return response
+
+    def _iter_chunks(self, chunks) -> Iterator[bytes]:
+        """Синхронный итератор над асинхронным: каждый чанк читается в цикле транспорта."""
+        async def _next() -> Optional[bytes]:
+            try:
+                return await anext(chunks, None)
+            except self._httpx.HTTPError as e:
+                raise TransportError(str(e)) from e
+
+        while True:
+            chunk = self._call(_next())
+            if chunk is None:
+                return
+            yield chunk
+
+    async def _close_stream(self, response, chunks) -> None:
+        await chunks.aclose()
+        await response.aclose()
+        self._account(response)
+
+    def _account(self, response) -> None:
+        self.stats["requests"] += 1
+        self.stats["bytes_received"] += response.num_bytes_downloaded
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._call(self.session.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+
+class _IterBytesReader:
+    """Файлоподобная обёртка над итератором байтовых чанков (для iterparse/gzip)."""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def make_transport(kind: str, headers: Mapping[str, str], **options) -> RequestsTransport | Http2Transport:
+    """Создаёт транспорт: 'http1' (requests) или 'http2' (httpx)."""
+    if kind in ("http1", "requests"):
+        return RequestsTransport(headers, **options)
+    if kind == "http2":
+        return Http2Transport(headers, **options)
+    raise ValueError(f"Неизвестный транспорт: {kind!r} (ожидается 'http1' или 'http2')")
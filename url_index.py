@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+from typing import Iterator, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+__all__ = ["canonicalize_url", "SetIndex", "BloomIndex", "make_seen_index"]
+
+
+# ========================================================================= #
+#                         КАНОНИЧЕСКИЙ ВИД URL                              #
+# ========================================================================= #
+def canonicalize_url(url: str) -> str:
+    """
+    Ключ URL для дедупликации: одна и та же страница, записанная по-разному,
+    даёт одинаковый ключ.
+    - схема (http/https) не учитывается, хост в нижнем регистре
+    - порт по умолчанию (80/443) отбрасывается
+    - повторные и завершающий '/' в пути убираются
+    - параметры запроса сортируются, фрагмент (#...) отбрасывается
+    Результат вида '//host/path?a=1&b=2' — это ключ, а не адрес для загрузки.
+    """
+    raw = url.strip()
+    if "://" not in raw:
+        raw = "//" + raw
+    parsed = urlsplit(raw)
+
+    host = (parsed.hostname or "").lower()
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parsed.path or "/")
+    path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunsplit(("", host, path, query, ""))
+
+
+# ========================================================================= #
+#                      ИНДЕКС «УЖЕ ВИДЕЛИ» (точный)                        #
+# ========================================================================= #
+class SetIndex:
+    """Точный индекс просмотренных URL на основе set (обычные прогоны)."""
+
+    def __init__(self) -> None:
+        self._keys: Set[str] = set()
+        self.hits: int = 0  # сколько раз URL отброшен как повтор
+
+    def add(self, url: str) -> bool:
+        """Запоминает URL. Возвращает True, если он встретился впервые."""
+        key = canonicalize_url(url)
+        if key in self._keys:
+            self.hits += 1
+            return False
+        self._keys.add(key)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return canonicalize_url(url) in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# ========================================================================= #
+#                  ИНДЕКС «УЖЕ ВИДЕЛИ» (фильтр Блума)                       #
+# ========================================================================= #
+class BloomIndex:
+    """
+    Вероятностный индекс для прогонов на миллионы URL: память фиксирована
+    и определяется capacity / error_rate. Ложные срабатывания возможны
+    (URL с вероятностью error_rate будет принят за повтор), пропусков нет.
+    """
+
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001) -> None:
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity > 0 и 0 < error_rate < 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        self._count = 0
+        self.hits: int = 0
+
+    def _positions(self, url: str) -> Iterator[int]:
+        digest = hashlib.blake2b(canonicalize_url(url).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % self._size
+
+    def add(self, url: str) -> bool:
+        """Запоминает URL. Возвращает True, если он (вероятно) встретился впервые."""
+        is_new = False
+        for pos in self._positions(url):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                is_new = True
+        if is_new:
+            self._count += 1
+        else:
+            self.hits += 1
+        return is_new
+
+    def __contains__(self, url: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+def make_seen_index(kind: str = "set", capacity: int = 10_000_000, error_rate: float = 0.001):
+    """Создаёт индекс просмотренных URL: 'set' (точный) или 'bloom'."""
+    if kind == "set":
+        return SetIndex()
+    if kind == "bloom":
+        return BloomIndex(capacity=capacity, error_rate=error_rate)
+    raise ValueError(f"Неизвестный тип индекса: {kind!r} (ожидается 'set' или 'bloom')")
@@ -1,13 +1,26 @@
 # ui/web_ui.py
 import streamlit as st
 import time
+from contextlib import nullcontext
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Tuple
+from itertools import chain
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 import pandas as pd
 
 from Parse import WebParser
+from crawl_pipeline import DEFAULT_INFLIGHT_BYTES
+from fetch_planner import DEFAULT_FIELDS, OUTPUT_FIELDS, FetchPlan
 from product_list_parser import ProductListParser
+from profiling import RunProfiler, as_profiler, profile_base_path
+from wide_table import WideTableBuilder
+
+# подпись в боковой панели → режим RunProfiler
+_PROFILE_OPTIONS = {
+    "Выключено": None,
+    "cProfile (точные вызовы, .prof)": "cprofile",
+    "Сэмплирование (speedscope / flamegraph)": "sampling",
+}
 
 
 class StreamlitUI:
@@ -52,6 +65,42 @@ class StreamlitUI:
                 output_file = st.text_input(
                     "Имя файла", "products.xlsx", key="start_output"
                 )
+                fields = st.multiselect(
+                    "Поля результата",
+                    OUTPUT_FIELDS,
+                    default=list(DEFAULT_FIELDS),
+                    key="start_fields",
+                    help="Если хватает полей карточек каталога (без «Описание» и "
+                         "«Характеристики»), детальные страницы товаров не загружаются.",
+                )
+                long_format = st.checkbox(
+                    "Длинный формат (артикул, характеристика, значение)",
+                    key="start_long_format",
+                    help="Для сильно разреженных каталогов: одна строка на каждую "
+                         "заполненную характеристику вместо сотен пустых колонок.",
+                )
+                use_sitemap = st.checkbox(
+                    "Искать товары через sitemap.xml",
+                    key="start_use_sitemap",
+                    help="Ссылки на товары берутся из sitemap без загрузки страниц "
+                         "категории. Если в sitemap ничего не найдено — обычный обход.",
+                )
+                sitemap_url = ""
+                sitemap_pattern = ""
+                if use_sitemap:
+                    sitemap_url = st.text_input(
+                        "Адрес sitemap (пусто — /sitemap.xml сайта)",
+                        "",
+                        key="start_sitemap_url",
+                    )
+                    sitemap_pattern = st.text_input(
+                        "Шаблон ссылок товаров (regex, необязательно)",
+                        "",
+                        key="start_sitemap_pattern",
+                        help="С шаблоном берутся все подходящие ссылки сайта, даже вне "
+                             "пути категории. Без шаблона — ссылки под путём категории, "
+                             "кроме подкатегорий и страниц пагинации.",
+                    )
                 if st.button(
                     "🚀 Начать парсинг", key="start_button", width='stretch'
                 ):
@@ -59,6 +108,11 @@ class StreamlitUI:
                         "mode": "start",
                         "url": url,
                         "output": output_file,
+                        "fields": fields,
+                        "long_format": long_format,
+                        "use_sitemap": use_sitemap,
+                        "sitemap_url": sitemap_url.strip() or None,
+                        "sitemap_pattern": sitemap_pattern.strip() or None,
                     }
 
             # ---------- Вкладка 2 – ProductListParser ------------------ #
@@ -69,11 +123,40 @@ class StreamlitUI:
                     placeholder="https://example.com/product/123",
                     key="links_input",
                 )
+                links_file = st.file_uploader(
+                    "…или файл со ссылками (CSV / XLSX / TXT)",
+                    type=["csv", "xlsx", "txt"],
+                    key="links_file",
+                )
                 output_file_links = st.text_input(
                     "Имя файла",
                     "product_list.xlsx",
                     key="links_output",
                 )
+                bloom_dedup = st.checkbox(
+                    "Экономный индекс дубликатов (фильтр Блума)",
+                    key="links_bloom",
+                    help="Для прогонов на миллионы ссылок: фиксированный объём памяти "
+                         "ценой редких ложных срабатываний.",
+                )
+                fetch_workers = st.number_input(
+                    "Параллельных загрузок",
+                    min_value=1,
+                    max_value=32,
+                    value=4,
+                    key="links_fetch_workers",
+                    help="Сколько категорий загружается одновременно "
+                         "(страницы одной категории — по очереди).",
+                )
+                inflight_mb = st.number_input(
+                    "Бюджет памяти на загруженные страницы, МБ",
+                    min_value=1,
+                    max_value=1024,
+                    value=64,
+                    key="links_inflight_mb",
+                    help="Загрузка приостанавливается, пока разбор не догонит: "
+                         "расход памяти не растёт с размером каталога.",
+                )
                 if st.button(
                     "🚀 Запустить",
                     key="list_button",
@@ -83,9 +166,24 @@ class StreamlitUI:
                     params = {
                         "mode": "productlist",
                         "links": raw_links,
+                        "links_file": links_file,
+                        "dedup_index": "bloom" if bloom_dedup else "set",
+                        "fetch_workers": int(fetch_workers),
+                        "max_inflight_bytes": int(inflight_mb) * 1024 * 1024,
                         "output": output_file_links,
                     }
 
+            profile_label = st.selectbox(
+                "Профилирование прогона",
+                list(_PROFILE_OPTIONS),
+                key="profile_mode",
+                help="Показывает, на что ушло время (загрузка, BeautifulSoup, "
+                     "очистка текста, запись Excel); файл профиля сохраняется "
+                     "рядом с результатом.",
+            )
+            if params is not None:
+                params["profile"] = _PROFILE_OPTIONS[profile_label]
+
             st.markdown("---")
             self.stats_placeholder = st.empty()
 
@@ -158,6 +256,8 @@ class StreamlitUI:
         - Всего ссылок: **{stats['total']}**
         - Успешно обработано: **{stats['success']}**
         - Ошибок: **{stats['failed']}**
+        - Некорректных ссылок: **{stats['invalid']}**
+        - Повторов пропущено: **{stats['dedup_hits']}**
         - Товаров собрано: **{stats['total_products']}**
         """
         )
@@ -166,6 +266,10 @@ class StreamlitUI:
             with st.expander("⚠️ Ссылки с ошибками"):
                 st.write(stats["failed_links"])
 
+        if stats["invalid"]:
+            with st.expander("🚫 Некорректные ссылки (пропущены)"):
+                st.write(stats["invalid_links"])
+
         # кнопка скачивания много-листового файла
         st.download_button(
             label="💾 Скачать Excel",
@@ -178,6 +282,31 @@ class StreamlitUI:
             width='stretch',
         )
 
+    # ------------------------------------------------------------------ #
+    #                          RENDER PROFILE                            #
+    # ------------------------------------------------------------------ #
+    def render_profile(self, profiler: RunProfiler, filename: str):
+        """Топ горячих функций прогона + скачивание файлов профиля"""
+        artifacts = profiler.save(profile_base_path(filename))
+        st.subheader("⏱ Профиль прогона")
+        st.caption(
+            f"Режим: {profiler.mode} · под профилировщиком {profiler.elapsed:.2f} с · "
+            f"сохранено: {', '.join(str(p) for p in artifacts)}"
+        )
+        st.dataframe(
+            pd.DataFrame(profiler.top_functions(20)),
+            width='stretch',
+            hide_index=True,
+        )
+        for path in artifacts:
+            st.download_button(
+                label=f"⬇️ {path.name}",
+                data=path.read_bytes(),
+                file_name=path.name,
+                mime="application/octet-stream",
+                key=f"profile_{path.name}",
+            )
+
     # ------------------------------------------------------------------ #
     #                             MAIN LOOP                              #
     # ------------------------------------------------------------------ #
@@ -189,14 +318,18 @@ class StreamlitUI:
             return
 
         self._init_progress()
+        profiler = as_profiler(params.get("profile"))
         try:
             if params["mode"] == "start":
-                result = self._run_parsing(params)
-                if result:
-                    self.render_results(*result)
+                with profiler or nullcontext():
+                    result = self._run_parsing(params)
+                    if result:
+                        self.render_results(*result)
             else:  # mode == productlist
-                stats, excel_data, out_file = self._run_product_list(params)
+                stats, excel_data, out_file = self._run_product_list(params, profiler)
                 self.render_product_list_results(stats, excel_data, out_file)
+            if profiler is not None:
+                self.render_profile(profiler, params["output"])
         except Exception as exc:
             st.error(f"⛔ Ошибка: {exc}")
         finally:
@@ -208,31 +341,72 @@ class StreamlitUI:
     #                      ORIGINAL START‑PARSER FLOW                    #
     # ------------------------------------------------------------------ #
     def _run_parsing(self, params: dict) -> Optional[Tuple[pd.DataFrame, str]]:
-        """Процесс парсинга для стартового URL (оригинальный режим)"""
-        links = self.parser.iter_category_product_links(params["url"])
-        if not links:
+        """
+        Процесс парсинга для стартового URL (оригинальный режим).
+        FetchPlan по выбранным полям решает, нужны ли детальные страницы:
+        если хватает данных карточек листинга, они не загружаются вовсе.
+        Каждая готовая строка сразу уходит в WideTableBuilder — список
+        словарей по всем товарам не накапливается.
+        """
+        plan = FetchPlan(params.get("fields") or DEFAULT_FIELDS)
+        self.parser.reset_seen_index()
+
+        self._update_progress(5, "Поиск ссылок на товары…")
+        total: Optional[int] = None
+        if params.get("use_sitemap"):
+            # из sitemap известны только ссылки — все поля берутся с детальных страниц
+            links = self.parser.discover_product_links(
+                params["url"],
+                sitemap_url=params.get("sitemap_url"),
+                url_pattern=params.get("sitemap_pattern"),
+            )
+            total = len(links)
+            rows = (plan.row_from_link(link) for link in links)
+        else:
+            # листинг читается постранично вместе с обработкой товаров
+            listing = ProductListParser([params["url"]], base_parser=self.parser)
+            rows = (
+                plan.row_from_listing(row)
+                for row in listing.iter_listing_rows(params["url"])
+            )
+        st.info(f"План: {plan.describe()}.")
+
+        self._update_progress(15, "Загрузка детальных страниц…")
+        # характеристики у товаров разные — колонки копятся по мере появления
+        table = WideTableBuilder()
+        fetched = 0
+
+        for idx, row in enumerate(rows, 1):
+            if plan.needs_detail(row):
+                fetched += 1
+                link = row["Ссылка"]
+                try:
+                    if total:
+                        self._update_progress(15 + int(70 * (idx / total)), f"Обработка товара {idx}/{total}")
+                        self._show_stats(total, idx)
+                    else:
+                        self._update_progress(50, f"Обработка товара {idx}")
+
+                    with st.spinner(f"Обработка: {link.split('/')[-1]}"):
+                        # нужные блоки вверху страницы — подвал и скрипты не качаем
+                        product_page = self.parser.get_page_streamed(link, "product")
+                        if product_page:
+                            plan.merge_detail(row, self.parser.parse_product(product_page))
+                            product_page.decompose()  # нужные поля уже извлечены
+                        time.sleep(0.1)  # имитация задержки
+                except Exception as ex:
+                    st.warning(f"Пропущен товар {idx}: {ex}")
+            table.add_row(plan.finalize(row))
+
+        if not len(table):
             raise Exception("Ссылки на товары не найдены")
-
-        self._update_progress(15, "Поиск ссылок на товары…")
-        total = len(links)
-        products: List[Dict[str, Any]] = []
-
-        for idx, link in enumerate(links, 1):
-            try:
-                progress = 15 + int(70 * (idx / total))
-                self._update_progress(progress, f"Обработка товара {idx}/{total}")
-                self._show_stats(total, idx)
-
-                with st.spinner(f"Обработка: {link.split('/')[-1]}"):
-                    product_page = self.parser.get_page(link)
-                    if product_page:
-                        products.append(self.parser.parse_product(product_page))
-                    time.sleep(0.1)  # имитация задержки
-            except Exception as ex:
-                st.warning(f"Пропущен товар {idx}: {ex}")
+        st.info(f"Детальных страниц загружено: **{fetched}** из {len(table)}.")
 
         self._update_progress(95, "Формирование отчёта…")
-        df = pd.DataFrame(products)
+        if params.get("long_format"):
+            df = table.to_long_dataframe(id_column="Артикул")
+        else:
+            df = table.to_dataframe()
         if df.empty:
             raise Exception("Не удалось собрать данные")
 
@@ -242,22 +416,35 @@ class StreamlitUI:
     #                 NEW FLOW  –  PRODUCT LIST PARSER                   #
     # ------------------------------------------------------------------ #
     def _run_product_list(
-        self, params: dict
+        self, params: dict, profiler: Optional[RunProfiler] = None
     ) -> Tuple[Dict[str, Any], bytes, str]:
         """Обработка произвольного списка URL-адресов (агрегация страниц в одном листе на URL)"""
-        links: List[str] = params["links"]
-        total = len(links)
-        if total == 0:
+        links: Iterable[str] = params["links"]
+        links_file = params.get("links_file")
+        if links_file is not None:
+            # ссылки из файла читаются лениво, по мере обхода
+            links = chain(
+                links,
+                ProductListParser.iter_links_from_file(links_file, links_file.name),
+            )
+        elif not params["links"]:
             raise Exception("Список ссылок пуст")
 
         self._update_progress(5, "Инициализация ProductListParser…")
         pl_parser = ProductListParser(
-            links=links, output_file=params["output"], base_parser=self.parser
+            links=links,
+            output_file=params["output"],
+            base_parser=self.parser,
+            dedup_index=params.get("dedup_index", "set"),
+            fetch_workers=params.get("fetch_workers", 4),
+            max_inflight_bytes=params.get("max_inflight_bytes", DEFAULT_INFLIGHT_BYTES),
         )
 
         # весь обход /page-N/ и сбор строк — внутри ProductListParser.run()
         self._update_progress(20, "Сканирование страниц и сбор данных…")
-        _, stats = pl_parser.run()
+        _, stats = pl_parser.run(profile=profiler)
+        if stats["total"] == 0:
+            raise Exception("Список ссылок пуст или содержит только некорректные URL")
 
         self._update_progress(95, "Формирование отчёта…")
         excel_bytes = pl_parser.save_results()
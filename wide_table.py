@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["WideTableBuilder"]
+
+# после стольких значений колонка, где повторов мало, перестаёт пулить значения
+_POOL_PROBE = 64
+
+
+# ========================================================================= #
+#                  ШИРОКАЯ ТАБЛИЦА С РАЗРЕЖЕННЫМИ КОЛОНКАМИ                 #
+# ========================================================================= #
+class WideTableBuilder:
+    """
+    Накопитель строк с произвольным набором колонок (характеристики товаров).
+
+    Имена колонок интернируются в индексы по мере появления (реестр схемы),
+    значения копятся по колонкам: для каждой колонки хранятся только номера
+    строк, где она заполнена, и сами значения. Повторяющиеся значения
+    («Да», «Красный», ...) хранятся одним объектом: у каждой колонки свой
+    пул, и колонка почти без повторов (название, описание) отказывается
+    от него после первых _POOL_PROBE значений — уникальные строки
+    не держат записи в словаре.
+    DataFrame строится за один проход, без объединения ключей по строкам,
+    как это делает pd.DataFrame(list_of_dicts).
+    """
+
+    def __init__(self) -> None:
+        self.columns: List[str] = []
+        self._column_index: Dict[str, int] = {}
+        self._rows: List[array] = []        # номера строк по колонкам
+        self._values: List[List[Any]] = []  # значения по колонкам
+        self._pools: List[Optional[Dict[Any, Any]]] = []  # пулы значений (None — без пула)
+        self._size = 0
+
+    # ------------------------------------------------------------------ #
+    #                          Реестр схемы                               #
+    # ------------------------------------------------------------------ #
+    def column_id(self, name: str) -> int:
+        """Индекс колонки; новая колонка регистрируется в порядке появления."""
+        index = self._column_index.get(name)
+        if index is None:
+            index = len(self.columns)
+            self._column_index[name] = index
+            self.columns.append(name)
+            self._rows.append(array("i"))
+            self._values.append([])
+            self._pools.append({})
+        return index
+
+    # ------------------------------------------------------------------ #
+    #                              Запись                                 #
+    # ------------------------------------------------------------------ #
+    def add_row(self, row: Mapping[str, Any]) -> int:
+        """Добавляет строку и возвращает её номер."""
+        row_id = self._size
+        for name, value in row.items():
+            if value is None:
+                continue
+            index = self.column_id(name)
+            values = self._values[index]
+            pool = self._pools[index]
+            if pool is not None:
+                value = pool.setdefault(value, value)
+                # тот же критерий, что и для Categorical в to_dataframe()
+                if len(values) + 1 == _POOL_PROBE and len(pool) * 2 > _POOL_PROBE:
+                    self._pools[index] = None
+            self._rows[index].append(row_id)
+            values.append(value)
+        self._size += 1
+        return row_id
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ------------------------------------------------------------------ #
+    #                              Выгрузка                               #
+    # ------------------------------------------------------------------ #
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Широкий формат: одна строка на товар, колонка на каждое поле.
+        Колонки с повторяющимися значениями (типичные характеристики)
+        собираются как pandas.Categorical — это и быстрее, и компактнее.
+        """
+        data: Dict[str, Any] = {}
+        for index, name in enumerate(self.columns):
+            rows = np.frombuffer(self._rows[index], dtype=np.int32)
+            values = self._values[index]
+            categories = dict.fromkeys(values)
+            if len(categories) * 2 <= len(values):
+                position = {value: code for code, value in enumerate(categories)}
+                codes = np.full(self._size, -1, dtype=np.int32)
+                codes[rows] = [position[value] for value in values]
+                data[name] = pd.Categorical.from_codes(codes, categories=list(categories))
+            else:
+                column = np.full(self._size, None, dtype=object)
+                column[rows] = values
+                data[name] = column
+        return pd.DataFrame(data, columns=list(self.columns))
+
+    def iter_long(self, id_column: Optional[str] = None) -> Iterator[Tuple[Any, str, Any]]:
+        """
+        Длинный формат (id, поле, значение) — только заполненные ячейки.
+        id берётся из id_column (например, 'Артикул'), иначе номер строки.
+        """
+        ids = self._id_values(id_column)
+        per_row: List[List[Tuple[str, Any]]] = [[] for _ in range(self._size)]
+        for index, name in enumerate(self.columns):
+            if name == id_column:
+                continue
+            for row_id, value in zip(self._rows[index], self._values[index]):
+                per_row[row_id].append((name, value))
+        for row_id, cells in enumerate(per_row):
+            for name, value in cells:
+                yield ids[row_id], name, value
+
+    def to_long_dataframe(self, id_column: Optional[str] = None) -> pd.DataFrame:
+        """Длинный формат для очень разреженных каталогов."""
+        id_name = id_column if id_column in self._column_index else "№"
+        frame = pd.DataFrame(
+            self.iter_long(id_column), columns=[id_name, "Характеристика", "Значение"]
+        )
+        frame["Характеристика"] = frame["Характеристика"].astype("category")
+        return frame
+
+    def _id_values(self, id_column: Optional[str]) -> List[Any]:
+        if id_column is None or id_column not in self._column_index:
+            return list(range(1, self._size + 1))
+        index = self._column_index[id_column]
+        ids: List[Any] = [None] * self._size
+        for row_id, value in zip(self._rows[index], self._values[index]):
+            ids[row_id] = value
+        return ids